@@ -0,0 +1,37 @@
+"""Content-hash analysis cache
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('content_digest', sa.String(), nullable=True))
+    op.create_index('ix_audio_jobs_content_digest', 'audio_jobs', ['content_digest'])
+    
+    # Create analysis_cache table
+    op.create_table('analysis_cache',
+        sa.Column('digest', sa.String(), nullable=False),
+        sa.Column('analysis_version', sa.String(), nullable=False),
+        sa.Column('features', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('processed_file_url', sa.String(), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('digest', 'analysis_version')
+    )
+
+def downgrade() -> None:
+    op.drop_table('analysis_cache')
+    op.drop_index('ix_audio_jobs_content_digest', table_name='audio_jobs')
+    op.drop_column('audio_jobs', 'content_digest')
@@ -0,0 +1,22 @@
+"""Per-stage feature readiness
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('feature_readiness', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('audio_jobs', 'feature_readiness')
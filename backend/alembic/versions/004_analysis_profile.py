@@ -0,0 +1,21 @@
+"""Analysis profile per job
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('analysis_profile', sa.String(), nullable=True, server_default='full'))
+
+def downgrade() -> None:
+    op.drop_column('audio_jobs', 'analysis_profile')
@@ -0,0 +1,21 @@
+"""Per-stage timings per job
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('stage_timings', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('audio_jobs', 'stage_timings')
@@ -0,0 +1,21 @@
+"""Multipart upload ID of presigned direct uploads
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('upload_id', sa.String(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('audio_jobs', 'upload_id')
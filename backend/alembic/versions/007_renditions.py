@@ -0,0 +1,23 @@
+"""Processed audio renditions per job and cache entry
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('audio_jobs', sa.Column('renditions', sa.JSON(), nullable=True))
+    op.add_column('analysis_cache', sa.Column('renditions', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('analysis_cache', 'renditions')
+    op.drop_column('audio_jobs', 'renditions')
@@ -30,11 +30,12 @@ async def create_generation(
     if not job:
         raise HTTPException(status_code=404, detail="Audio job not found")
     
-    if job.status != JobStatus.COMPLETED:
+    # Generation may start while later analysis stages (spectral) are still running
+    if job.status not in (JobStatus.COMPLETED, JobStatus.PROCESSING):
         raise HTTPException(status_code=400, detail="Audio processing not completed")
     
-    if not job.features:
-        raise HTTPException(status_code=400, detail="Audio features not available")
+    if not job.features or not job.stages_ready(job.generation_stages()):
+        raise HTTPException(status_code=400, detail="Audio features not available yet")
     
     # Create generation record
     generation_id = str(uuid.uuid4())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark the audio analysis pipeline on synthetic tracks with known ground truth.
+
+Measures wall time, CPU time and peak memory per analysis stage plus accuracy
+(beat/downbeat F-measure, tempo error, key hits, section boundaries) and writes a
+JSON report. Runs fully offline.
+
+    python -m benchmarks.audio_analysis --corpus quick --output report.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import librosa
+import numpy as np
+
+from models.audio import AnalysisProfile, ANALYSIS_VERSION, PROFILE_STAGES
+from utils.audio_decode import MASTER_SAMPLE_RATE
+from utils.feature_cache import AnalysisBuffers
+from utils.streaming_analysis import StreamingFeatureCache, should_stream, STREAMING_ANALYSIS_SR
+from workers.audio_processor import (
+    run_analysis,
+    run_beats_stage,
+    run_key_stage,
+    run_structure_stage,
+    run_spectral_stage
+)
+from benchmarks.metrics import f_measure, section_label_agreement, tempo_error
+from benchmarks.synthetic import CORPORA, ground_truth, render_track, iter_track_blocks
+
+# Tolerance windows for event matching, in seconds
+BEAT_WINDOW = 0.07
+BOUNDARY_WINDOW = 3.0
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    """Run func, returning its result with wall time, CPU time and peak traced memory above baseline"""
+
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func()
+    stats = {
+        'wall_time': time.perf_counter() - wall_start,
+        'cpu_time': time.process_time() - cpu_start,
+        'peak_memory_mb': (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20
+    }
+    return result, stats
+
+def load_buffers(spec: Dict[str, Any]):
+    """In-memory buffers, or streamed summaries for tracks long enough to be streamed in production"""
+    if should_stream(spec['duration']):
+        return StreamingFeatureCache.from_chunks(iter_track_blocks(spec, STREAMING_ANALYSIS_SR), STREAMING_ANALYSIS_SR)
+    return AnalysisBuffers(render_track(spec, MASTER_SAMPLE_RATE), MASTER_SAMPLE_RATE)
+
+def benchmark_track(spec: Dict[str, Any], profile: AnalysisProfile) -> Dict[str, Any]:
+    """Time, memory and accuracy of one synthetic track"""
+
+    stages = PROFILE_STAGES[profile]
+
+    # End to end with concurrent stages, untraced so tracemalloc does not skew the timing
+    buffers = load_buffers(spec)
+    wall_start = time.perf_counter()
+    run_analysis(buffers, MASTER_SAMPLE_RATE, profile)
+    end_to_end = time.perf_counter() - wall_start
+    del buffers
+
+    # Stage by stage on fresh buffers; lazily computed features are charged to the first stage reading them
+    tracemalloc.start()
+    stage_stats = {}
+    buffers, stage_stats['load'] = measure(lambda: load_buffers(spec))
+    runners = {
+        'beats': lambda done: run_beats_stage(buffers, use_madmom=profile != AnalysisProfile.FAST),
+        'key': lambda done: run_key_stage(buffers, done['beats']),
+        'structure': lambda done: run_structure_stage(buffers, done['beats']),
+        'spectral': lambda done: run_spectral_stage(buffers, done['beats']),
+    }
+    results = {}
+    for stage in stages:
+        results[stage], stage_stats[stage] = measure(lambda: runners[stage](results))
+    tracemalloc.stop()
+
+    return {
+        'name': spec['name'],
+        'duration': spec['duration'],
+        'streamed': should_stream(spec['duration']),
+        'end_to_end_wall_time': end_to_end,
+        'realtime_factor': spec['duration'] / end_to_end if end_to_end > 0 else None,
+        'stages': stage_stats,
+        'accuracy': score_results(ground_truth(spec), results),
+    }
+
+def score_results(truth: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    """Accuracy of each stage's output against the synthetic ground truth"""
+
+    beats = results['beats']
+    scores = {
+        'bpm': beats['bpm'],
+        'tempo_error': tempo_error(truth['bpm'], beats['bpm']),
+        'beat_f_measure': f_measure(truth['beat_times'], beats['beat_times'], BEAT_WINDOW),
+        'downbeat_f_measure': f_measure(truth['downbeat_times'], beats['downbeat_times'], BEAT_WINDOW),
+        'time_signature_hit': beats.get('time_signature') == truth['time_signature'],
+        'beat_tracking_path': beats.get('beat_tracking_path'),
+    }
+    if 'key' in results:
+        scores['key'] = results['key'].get('key')
+        scores['key_hit'] = scores['key'] == truth['key']
+        scores['bar_chord_accuracy'] = chord_accuracy(truth, results['key'].get('harmony', []))
+    if 'structure' in results:
+        boundaries = [section.start for section in results['structure'][1:]]
+        scores['section_boundary_f_measure'] = f_measure(truth['section_boundaries'], boundaries, BOUNDARY_WINDOW)
+        scores['section_label_pairwise_f'] = section_label_agreement(truth, results['structure'])
+    return scores
+
+def chord_accuracy(truth: Dict[str, Any], harmony: List[Any]) -> Optional[float]:
+    """Share of true bars whose chord is labelled correctly by the estimated bar starting closest to them"""
+
+    if not harmony:
+        return None
+    starts = np.array([bar.start for bar in harmony])
+    hits = [
+        harmony[int(np.argmin(np.abs(starts - start)))].chord == chord
+        for start, chord in zip(truth['downbeat_times'], truth['bar_chords'])
+    ]
+    return float(np.mean(hits))
+
+def summarize(tracks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Corpus-level means for comparing runs"""
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return float(np.mean(values)) if values else None
+
+    accuracy = [track['accuracy'] for track in tracks]
+    key_hits = [a['key_hit'] for a in accuracy if 'key_hit' in a]
+    return {
+        'tracks': len(tracks),
+        'audio_seconds': sum(track['duration'] for track in tracks),
+        'end_to_end_wall_time': sum(track['end_to_end_wall_time'] for track in tracks),
+        'mean_beat_f_measure': mean(a['beat_f_measure'] for a in accuracy),
+        'mean_downbeat_f_measure': mean(a['downbeat_f_measure'] for a in accuracy),
+        'mean_tempo_error': mean(a['tempo_error']['relative'] for a in accuracy),
+        'mean_tempo_error_octave_tolerant': mean(a['tempo_error']['octave_tolerant'] for a in accuracy),
+        'key_hit_rate': float(np.mean(key_hits)) if key_hits else None,
+        'mean_bar_chord_accuracy': mean(a.get('bar_chord_accuracy') for a in accuracy),
+        'mean_section_boundary_f_measure': mean(a.get('section_boundary_f_measure') for a in accuracy),
+        'mean_section_label_pairwise_f': mean(a.get('section_label_pairwise_f') for a in accuracy),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audio analysis on synthetic ground-truth tracks")
+    parser.add_argument('--corpus', choices=sorted(CORPORA), default='quick')
+    parser.add_argument('--profile', choices=[p.value for p in AnalysisProfile], default=AnalysisProfile.FULL.value)
+    parser.add_argument('--track', action='append', help="Only run tracks whose name contains this (repeatable)")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    profile = AnalysisProfile(args.profile)
+    specs = [
+        spec for spec in CORPORA[args.corpus]
+        if not args.track or any(pattern in spec['name'] for pattern in args.track)
+    ]
+
+    tracks = []
+    for spec in specs:
+        print(f"Benchmarking {spec['name']}...", file=sys.stderr)
+        tracks.append(benchmark_track(spec, profile))
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'analysis_version': ANALYSIS_VERSION,
+        'profile': profile.value,
+        'corpus': args.corpus,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'librosa': librosa.__version__,
+            'cpu_count': os.cpu_count(),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        'summary': summarize(tracks),
+        'tracks': tracks,
+    }
+
+    output = json.dumps(report, indent=2, default=float)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
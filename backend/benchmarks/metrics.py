@@ -0,0 +1,65 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+def f_measure(reference: Sequence[float], estimated: Sequence[float], window: float = 0.07) -> float:
+    """F-measure of event times matched one-to-one within +/- window seconds.
+
+    Reference events are assumed to be more than 2 * window apart, so each can
+    match at most one estimate (beats at up to ~400 BPM with the default window).
+    """
+
+    reference = np.sort(np.asarray(reference, dtype=np.float64))
+    estimated = np.sort(np.asarray(estimated, dtype=np.float64))
+    if len(reference) == 0 or len(estimated) == 0:
+        return float(len(reference) == len(estimated))
+
+    # Nearest estimate to each reference event
+    idx = np.clip(np.searchsorted(estimated, reference), 1, len(estimated) - 1)
+    left, right = estimated[idx - 1], estimated[idx]
+    nearest = np.where(np.abs(reference - left) <= np.abs(reference - right), idx - 1, idx)
+    if len(estimated) == 1:
+        nearest = np.zeros(len(reference), dtype=int)
+    matched = np.abs(estimated[nearest] - reference) <= window
+
+    # An estimate between two close references may be nearest to both; count it once
+    hits = len(np.unique(nearest[matched]))
+    return 2.0 * hits / (len(reference) + len(estimated))
+
+def tempo_error(reference_bpm: float, estimated_bpm: float) -> Dict[str, float]:
+    """Relative tempo error, plain and allowing for half/double-tempo (octave) errors"""
+
+    relative = abs(estimated_bpm - reference_bpm) / reference_bpm
+    octave = min(abs(estimated_bpm * factor - reference_bpm) / reference_bpm for factor in (0.5, 1.0, 2.0))
+    return {'relative': float(relative), 'octave_tolerant': float(octave)}
+
+def pairwise_label_f(reference: Sequence[Any], estimated: Sequence[Any]) -> float:
+    """Pairwise F-measure of two labellings of the same items (e.g. a section label per bar).
+
+    A pair of items counts as a hit when both labellings put them under one label, so
+    the score rewards finding which parts repeat, whatever the labels are called.
+    """
+
+    reference = np.asarray(reference)
+    estimated = np.asarray(estimated)
+    upper = np.triu_indices(len(reference), 1)
+    same_reference = (reference[:, None] == reference[None, :])[upper]
+    same_estimated = (estimated[:, None] == estimated[None, :])[upper]
+    hits = np.sum(same_reference & same_estimated)
+    if hits == 0:
+        return 0.0
+    precision = hits / np.sum(same_estimated)
+    recall = hits / np.sum(same_reference)
+    return float(2 * precision * recall / (precision + recall))
+
+def section_label_agreement(truth: Dict[str, Any], sections: List[Any]) -> Optional[float]:
+    """Pairwise F of the section label of each true bar, so repeats must share a label to score"""
+
+    if not sections:
+        return None
+    starts = np.array([section.start for section in sections])
+    reference = [section['label'] for section in truth['sections'] for _ in range(section['start_bar'], section['end_bar'])]
+    estimated = [
+        sections[max(int(np.searchsorted(starts, downbeat + 1e-3)) - 1, 0)].label
+        for downbeat in truth['downbeat_times'][:len(reference)]
+    ]
+    return pairwise_label_f(reference, estimated)
@@ -0,0 +1,187 @@
+import numpy as np
+from typing import Any, Dict, Iterator, List
+
+from utils.audio_analysis import KEY_NAMES
+
+MAJOR_SCALE = [0, 2, 4, 5, 7, 9, 11]
+MINOR_SCALE = [0, 2, 3, 5, 7, 8, 10]
+
+# Chord progressions as scale degrees, one chord per bar; each section texture uses one
+PROGRESSIONS = {
+    'verse': [0, 5, 3, 4],
+    'chorus': [3, 4, 0, 0],
+    'bridge': [5, 3, 0, 4],
+}
+
+# Drum sounds and how long their tails ring past the event time
+TAIL_SECONDS = 0.25
+
+def track_spec(name: str, duration: float, bpm: float, key: str = "C major", beats_per_bar: int = 4,
+               section_bars: List[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """Description of a synthetic track; the renderer and the ground truth both derive from it"""
+    return {
+        'name': name,
+        'duration': float(duration),
+        'bpm': float(bpm),
+        'key': key,
+        'beats_per_bar': beats_per_bar,
+        'section_bars': section_bars or [4, 8, 8, 8],
+        'seed': seed,
+    }
+
+# Synthetic corpora from 10 s clips up to a 20 minute mix (which takes the streamed path)
+QUICK_CORPUS = [
+    track_spec('clip_10s_120_4-4', 10, 120, 'C major', seed=1),
+    track_spec('clip_30s_92_4-4', 30, 92, 'A minor', seed=2),
+    track_spec('loop_60s_140_3-4', 60, 140, 'G major', beats_per_bar=3, section_bars=[6, 12], seed=3),
+]
+STANDARD_CORPUS = QUICK_CORPUS + [
+    track_spec('song_3m_75_4-4', 180, 75, 'F# minor', seed=4),
+    track_spec('song_5m_128_4-4', 300, 128, 'D# major', section_bars=[8, 16, 16, 8], seed=5),
+]
+FULL_CORPUS = STANDARD_CORPUS + [
+    track_spec('mix_20m_124_4-4', 1200, 124, 'D minor', section_bars=[16, 32], seed=6),
+]
+CORPORA = {'quick': QUICK_CORPUS, 'standard': STANDARD_CORPUS, 'full': FULL_CORPUS}
+
+def ground_truth(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Beat, downbeat, key, chord and section annotations of a synthetic track"""
+
+    period = 60.0 / spec['bpm']
+    beats_per_bar = spec['beats_per_bar']
+    # Whole bars only, leaving room for the last drum tail
+    n_bars = int((spec['duration'] - period - TAIL_SECONDS) // (period * beats_per_bar))
+    beat_times = period + np.arange(n_bars * beats_per_bar) * period
+    downbeat_times = beat_times[::beats_per_bar]
+
+    # Sections cycle through their bar counts and textures until the bars run out
+    labels = list(PROGRESSIONS)
+    sections = []
+    bar = 0
+    while bar < n_bars:
+        length = spec['section_bars'][len(sections) % len(spec['section_bars'])]
+        end_bar = min(bar + length, n_bars)
+        sections.append({
+            'label': labels[len(sections) % len(labels)],
+            'start_bar': bar,
+            'end_bar': end_bar,
+            'start': float(downbeat_times[bar]),
+            'end': float(downbeat_times[end_bar]) if end_bar < n_bars else float(beat_times[-1] + period),
+        })
+        bar = end_bar
+
+    # Chord label of each bar, from its section's progression
+    tonic, scale = parse_key(spec['key'])
+    bar_chords = [
+        chord_label(tonic, scale, PROGRESSIONS[section['label']][(bar - section['start_bar']) % len(PROGRESSIONS[section['label']])])
+        for section in sections for bar in range(section['start_bar'], section['end_bar'])
+    ]
+
+    return {
+        'bpm': spec['bpm'],
+        'time_signature': f"{beats_per_bar}/4",
+        'key': spec['key'],
+        'beat_times': beat_times,
+        'downbeat_times': downbeat_times,
+        'sections': sections,
+        'section_boundaries': np.array([section['start'] for section in sections[1:]]),
+        'bar_chords': bar_chords,
+    }
+
+def render_track(spec: Dict[str, Any], sr: int) -> np.ndarray:
+    """Render a whole synthetic track as mono float32"""
+    return render_span(spec, sr, 0.0, spec['duration'])
+
+def iter_track_blocks(spec: Dict[str, Any], sr: int, block_seconds: float = 30.0) -> Iterator[np.ndarray]:
+    """Render a synthetic track block by block, for streamed analysis of long tracks"""
+
+    start = 0.0
+    while start < spec['duration']:
+        end = min(start + block_seconds, spec['duration'])
+        yield render_span(spec, sr, start, end)
+        start = end
+
+def render_span(spec: Dict[str, Any], sr: int, start: float, end: float) -> np.ndarray:
+    """Render [start, end) of a synthetic track; spans concatenate sample-exactly"""
+
+    truth = ground_truth(spec)
+    first = int(round(start * sr))
+    y = np.zeros(int(round(end * sr)) - first, dtype=np.float64)
+    sounds = drum_sounds(sr, spec['seed'])
+
+    # Drum events: kick on downbeats (and mid-bar in 4/4), snare on backbeats, hats on eighths
+    beats_per_bar = spec['beats_per_bar']
+    period = 60.0 / spec['bpm']
+    for i, beat in enumerate(truth['beat_times']):
+        position = i % beats_per_bar
+        events = [('hat', beat, 0.15), ('hat', beat + period / 2, 0.1)]
+        if position == 0:
+            events.append(('kick', beat, 1.0))
+        elif beats_per_bar == 4 and position == 2:
+            events.append(('kick', beat, 0.7))
+        else:
+            events.append(('snare', beat, 0.6))
+        for name, time, gain in events:
+            if start - TAIL_SECONDS <= time < end:
+                add_sound(y, sounds[name] * gain, int(round(time * sr)) - first)
+
+    # Sustained chords, one per bar, from the section's progression in the track key
+    tonic, scale = parse_key(spec['key'])
+    bar_length = period * beats_per_bar
+    for section in truth['sections']:
+        progression = PROGRESSIONS[section['label']]
+        for bar in range(section['start_bar'], section['end_bar']):
+            bar_start = truth['downbeat_times'][bar]
+            if bar_start + bar_length <= start or bar_start >= end:
+                continue
+            degree = progression[(bar - section['start_bar']) % len(progression)]
+            add_chord(y, sr, first, bar_start, bar_length, tonic, scale, degree)
+
+    return (0.5 * y).astype(np.float32)
+
+def drum_sounds(sr: int, seed: int) -> Dict[str, np.ndarray]:
+    """Kick, snare and hi-hat one-shots"""
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(TAIL_SECONDS * sr)) / sr
+    kick = np.sin(2 * np.pi * (50 * t + 70 * (1 - np.exp(-t * 30)) / 30)) * np.exp(-t * 18)
+    snare = rng.standard_normal(len(t)) * np.exp(-t * 30) * 0.6 + np.sin(2 * np.pi * 190 * t) * np.exp(-t * 25) * 0.4
+    hat = np.diff(rng.standard_normal(len(t) + 1)) * np.exp(-t * 90) * 0.3
+    return {'kick': kick, 'snare': snare, 'hat': hat}
+
+def add_sound(y: np.ndarray, sound: np.ndarray, offset: int):
+    """Mix a one-shot into y at a sample offset that may fall outside y"""
+
+    lo = max(offset, 0)
+    hi = min(offset + len(sound), len(y))
+    if lo < hi:
+        y[lo:hi] += sound[lo - offset:hi - offset]
+
+def add_chord(y: np.ndarray, sr: int, first: int, bar_start: float, bar_length: float,
+              tonic: int, scale: List[int], degree: int):
+    """Mix a triad plus bass root, held for one bar, into the span starting at sample `first`"""
+
+    lo = max(int(round(bar_start * sr)), first)
+    hi = min(int(round((bar_start + bar_length) * sr)), first + len(y))
+    t = np.arange(lo, hi) / sr
+    # Short fades so chord changes do not click
+    envelope = np.minimum(1.0, np.minimum(t - bar_start, bar_start + bar_length - t) / 0.02)
+
+    notes = [60 + tonic + scale[(degree + step) % 7] + 12 * ((degree + step) // 7) for step in (0, 2, 4)]
+    notes.append(notes[0] - 24)
+    chord = sum(np.sin(2 * np.pi * midi_to_hz(note) * t) for note in notes)
+    y[lo - first:hi - first] += 0.12 * envelope * chord
+
+def parse_key(key: str):
+    """Tonic pitch class and scale of a key label such as 'A minor'"""
+    tonic, mode = key.split()
+    return KEY_NAMES.index(tonic), MAJOR_SCALE if mode == 'major' else MINOR_SCALE
+
+def chord_label(tonic: int, scale: List[int], degree: int) -> str:
+    """Label of the diatonic triad on a scale degree, e.g. 'Am' (diminished triads count as minor)"""
+    root = scale[degree % 7]
+    third = (scale[(degree + 2) % 7] - root) % 12
+    return KEY_NAMES[(tonic + root) % 12] + ('' if third == 4 else 'm')
+
+def midi_to_hz(note: int) -> float:
+    return 440.0 * 2 ** ((note - 69) / 12)
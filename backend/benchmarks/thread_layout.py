@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker thread layouts: how many worker processes, concurrent analysis stages
+per process and BLAS/OpenMP/numba threads per stage get the most analyses through the
+CPUs with the shortest tail.
+
+Each layout runs a batch of analyses of one synthetic track on its own set of fresh
+processes (native pools size themselves at import, so they cannot be reused) and reports
+throughput, per-job latency percentiles and threads per CPU as JSON.
+
+    python -m benchmarks.thread_layout --jobs 24 --layout 4x1x1 --layout 4x4x4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from models.audio import AnalysisProfile, ANALYSIS_VERSION
+from utils.audio_decode import MASTER_SAMPLE_RATE
+from utils.thread_budget import NATIVE_THREAD_ENV, available_cpus, thread_layout, apply_thread_layout
+from benchmarks.audio_analysis import load_buffers
+from benchmarks.synthetic import CORPORA
+
+# Short clip analyzed once per process first, so model loading and numba compilation are not timed
+WARMUP_SECONDS = 5
+
+# Track the processes of a layout analyze, set by their initializer
+_spec = None
+
+def named_layouts(cpus: int) -> Dict[str, Dict[str, Any]]:
+    """Layouts compared by default: the unbudgeted worker against budgeted splits of the CPUs"""
+
+    # Celery's default of one child per CPU, each running up to 4 stages whose native pools span every CPU
+    unbudgeted = {'cpus': cpus, 'concurrency': cpus, 'threads_per_child': cpus,
+                  'stage_workers': min(4, cpus), 'native_threads': cpus}
+    layouts = {'unbudgeted': unbudgeted, 'budgeted': thread_layout(cpus, cpus)}
+    if cpus >= 4:
+        layouts['half_children'] = thread_layout(cpus // 2, cpus)
+    if cpus >= 2:
+        layouts['single_child'] = thread_layout(1, cpus)
+    return layouts
+
+def parse_layout(text: str, cpus: int) -> Dict[str, Any]:
+    """Layout from `processes x stage workers x native threads`, e.g. 4x1x2"""
+
+    try:
+        processes, stages, native = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Layout '{text}' is not PROCESSESxSTAGESxTHREADS")
+    return {'cpus': cpus, 'concurrency': processes, 'threads_per_child': stages * native,
+            'stage_workers': stages, 'native_threads': native}
+
+def init_process(spec: Dict[str, Any], layout: Dict[str, Any], profile: str, ready):
+    """Pin this process to the layout, warm the analysis path up on a short clip and wait for the others"""
+
+    global _spec
+    from workers.audio_processor import run_analysis
+
+    try:
+        apply_thread_layout(layout)
+        _spec = spec
+        warmup = {**spec, 'duration': float(min(WARMUP_SECONDS, spec['duration']))}
+        run_analysis(load_buffers(warmup), MASTER_SAMPLE_RATE, profile)
+    finally:
+        # A failed process still arrives, so the pool reports it broken instead of hanging
+        ready.wait()
+
+def run_job(profile: str) -> Dict[str, float]:
+    """Analyze the process's track once; rendering is not timed"""
+
+    from workers.audio_processor import run_analysis
+
+    buffers = load_buffers(_spec)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    run_analysis(buffers, MASTER_SAMPLE_RATE, profile)
+    return {'latency': time.perf_counter() - wall_start, 'cpu_time': time.process_time() - cpu_start}
+
+def benchmark_layout(layout: Dict[str, Any], spec: Dict[str, Any], profile: str, jobs: int) -> Dict[str, Any]:
+    """Run `jobs` analyses on fresh processes with the layout's thread limits"""
+
+    # Spawned processes load numpy with these in their environment
+    saved = {name: os.environ.get(name) for name in (*NATIVE_THREAD_ENV, 'ANALYSIS_CPU_BUDGET')}
+    os.environ.update({name: str(layout['native_threads']) for name in NATIVE_THREAD_ENV})
+    os.environ['ANALYSIS_CPU_BUDGET'] = str(layout['stage_workers'])
+    try:
+        context = multiprocessing.get_context('spawn')
+        ready = context.Barrier(layout['concurrency'] + 1)
+        with ProcessPoolExecutor(max_workers=layout['concurrency'], mp_context=context,
+                                 initializer=init_process, initargs=(spec, layout, profile, ready)) as pool:
+            # One no-op per process starts them all; the clock starts once every one is warm
+            warm = [pool.submit(time.sleep, 0) for _ in range(layout['concurrency'])]
+            ready.wait()
+            for future in warm:
+                future.result()
+            started = time.perf_counter()
+            results = [future.result() for future in as_completed([pool.submit(run_job, profile) for _ in range(jobs)])]
+            wall_time = time.perf_counter() - started
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    latencies = np.array([result['latency'] for result in results])
+    return {
+        'layout': layout,
+        'threads_per_cpu': layout['concurrency'] * layout['stage_workers'] * layout['native_threads'] / layout['cpus'],
+        'jobs': jobs,
+        'wall_time': wall_time,
+        'jobs_per_minute': 60 * jobs / wall_time,
+        'latency': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max()),
+        },
+        'cpu_time_per_job': float(np.mean([result['cpu_time'] for result in results])),
+    }
+
+def main():
+    cpus = available_cpus()
+    tracks = {spec['name']: spec for corpus in CORPORA.values() for spec in corpus}
+
+    parser = argparse.ArgumentParser(description="Compare worker thread layouts on concurrent synthetic analyses")
+    parser.add_argument('--track', choices=sorted(tracks), default='clip_30s_92_4-4')
+    parser.add_argument('--profile', choices=[p.value for p in AnalysisProfile], default=AnalysisProfile.FULL.value)
+    parser.add_argument('--jobs', type=int, default=4 * cpus, help="Analyses per layout")
+    parser.add_argument('--layout', action='append', type=lambda text: parse_layout(text, cpus),
+                        help="PROCESSESxSTAGESxTHREADS to run instead of the default layouts (repeatable)")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    layouts = (
+        {f"{l['concurrency']}x{l['stage_workers']}x{l['native_threads']}": l for l in args.layout}
+        if args.layout else named_layouts(cpus)
+    )
+
+    results = {}
+    for name, layout in layouts.items():
+        print(f"Benchmarking layout {name}...", file=sys.stderr)
+        results[name] = benchmark_layout(layout, tracks[args.track], args.profile, args.jobs)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'analysis_version': ANALYSIS_VERSION,
+        'profile': args.profile,
+        'track': args.track,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'available_cpus': cpus,
+        },
+        'layouts': results,
+    }
+
+    output = json.dumps(report, indent=2, default=float)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
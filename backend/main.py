@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import re
@@ -6,15 +7,32 @@ from datetime import datetime
 from typing import Optional, List
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from pydantic import BaseModel, validator
 
 from database import get_db, create_tables
-from models.audio import AudioJob, AudioFeatures, JobStatus
-from utils.storage import upload_file_to_s3
-from workers.audio_processor import process_audio_file, process_audio_url
+from models.audio import AudioJob, AudioFeatures, AnalysisProfile, JobStatus, profile_rank
+from utils.storage import (
+    MultipartUpload,
+    S3_PART_SIZE,
+    PRESIGN_EXPIRY,
+    key_from_url,
+    download_range_from_s3,
+    object_info,
+    presign_download,
+    delete_from_s3
+)
+from utils.waveform_peaks import waveform_key, fetch_header, select_level, peak_range, byte_range
+from utils.analysis_cache import lookup_cached_analysis
+from utils.feature_store import load_features
+from utils.interval_index import TimelineIndex
+from utils.renditions import legacy_renditions
+from utils.tempo_probe import probe_tempo, PREVIEW_MAX_BYTES, PREVIEW_TIMEOUT
+from utils.upload_stream import stream_upload, sniff_audio_format, UploadRejected, UploadTooLarge
+from workers.audio_processor import process_audio_file, process_audio_batch, process_audio_url, reanalyze_audio_job, BATCH_MAX_JOBS
 from workers.celery_app import celery_app
 
 # Configure logging
@@ -39,14 +57,76 @@ app.add_middleware(
 # Initialize database
 create_tables()
 
+# Upload size limit, enforced while the body streams to storage
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+# Status message of uploads left for POST /api/v1/batches instead of being queued one by one
+DEFERRED_MESSAGE = "Waiting for batch processing"
+
+ALLOWED_AUDIO_TYPES = ['audio/wav', 'audio/mpeg', 'audio/mp4', 'audio/aac', 'audio/ogg', 'audio/flac']
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads whose declared length is over the limit before the body is read"""
+    
+    if request.url.path == "/api/v1/upload":
+        # Allow for the multipart form overhead around the file
+        length = request.headers.get('content-length', '')
+        if length.isdigit() and int(length) > MAX_UPLOAD_BYTES + 1024 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "File too large (max 200MB)"})
+    return await call_next(request)
+
+# Top-level fields the features endpoint can project (metadata-only jobs store 'metadata')
+FEATURE_FIELDS = set(AudioFeatures.model_fields) | {'metadata'}
+
+class TempoPreview(BaseModel):
+    bpm: float
+    duration: Optional[float] = None
+    key: Optional[str] = None
+    key_confidence: Optional[float] = None
+    provisional: bool = True
+
 class UploadResponse(BaseModel):
     job_id: str
     message: str
+    preview: Optional[TempoPreview] = None
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: str
+    sha256: str
+    user_id: Optional[str] = None
+    analysis_profile: AnalysisProfile = AnalysisProfile.FULL
+    
+    @validator('filename')
+    def validate_filename(cls, v):
+        v = v.strip()
+        if not v or '/' in v or '\\' in v:
+            raise ValueError('Invalid filename')
+        return v
+    
+    @validator('sha256')
+    def validate_sha256(cls, v):
+        if not re.fullmatch(r'[0-9a-f]{64}', v.lower()):
+            raise ValueError('sha256 must be a hex SHA-256 digest')
+        return v.lower()
+
+class UploadPart(BaseModel):
+    part_number: int
+    url: str
+
+class DirectUploadResponse(BaseModel):
+    job_id: str
+    part_size: int
+    parts: List[UploadPart]
+    expires_in: int
 
 class URLIngestRequest(BaseModel):
     url: str
     confirm_rights: bool
     metadata_only: Optional[bool] = False
+    analysis_profile: AnalysisProfile = AnalysisProfile.FULL
     
     @validator('url')
     def validate_url(cls, v):
@@ -69,11 +149,38 @@ class URLIngestRequest(BaseModel):
         except Exception as e:
             raise ValueError(f'Invalid URL format: {str(e)}')
 
+class BatchRequest(BaseModel):
+    job_ids: List[str]
+    
+    @validator('job_ids')
+    def validate_job_ids(cls, v):
+        if not v:
+            raise ValueError('job_ids cannot be empty')
+        return list(dict.fromkeys(v))
+
+class BatchResponse(BaseModel):
+    queued: List[str]
+    skipped: List[str]
+    task_ids: List[str]
+
+class ProfileUpgradeRequest(BaseModel):
+    analysis_profile: AnalysisProfile
+
+class TimelinePosition(BaseModel):
+    time: float
+    bar: int  # -1 outside every bar
+    beat: int  # last beat at or before the time, -1 before the first
+    beat_in_bar: int
+    section: int  # -1 outside every section
+    section_name: Optional[str] = None
+    section_label: Optional[str] = None
+
 class JobStatusResponse(BaseModel):
     job_id: str
     status: JobStatus
     progress: float
     message: str
+    ready_stages: List[str] = []
     created_at: datetime
     updated_at: datetime
 
@@ -85,29 +192,79 @@ async def health_check():
 async def upload_audio(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    user_id: Optional[str] = Form(None)
+    user_id: Optional[str] = Form(None),
+    analysis_profile: AnalysisProfile = Form(AnalysisProfile.FULL),
+    defer_processing: bool = Form(False)
 ):
-    """Upload audio file for processing"""
+    """Upload audio file for processing, or for a later batch (catalogue imports)"""
     
-    # Validate file type and size
-    allowed_types = ['audio/wav', 'audio/mpeg', 'audio/mp4', 'audio/aac', 'audio/ogg', 'audio/flac']
-    if file.content_type not in allowed_types:
+    # Validate declared file type
+    if file.content_type not in ALLOWED_AUDIO_TYPES:
         raise HTTPException(status_code=400, detail="Unsupported audio format")
     
-    # Check file size (200MB limit)
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    if file_size > 200 * 1024 * 1024:  # 200MB
-        raise HTTPException(status_code=400, detail="File too large (max 200MB)")
-    
-    # Generate job ID and upload to S3
+    # Stream the body to storage in parts, hashing, size-checking and sniffing it on the way
     job_id = str(uuid.uuid4())
     file_key = f"uploads/{job_id}/{file.filename}"
+    previews = []
+    try:
+        upload = await stream_upload(
+            file, file_key, MAX_UPLOAD_BYTES, PREVIEW_MAX_BYTES,
+            on_prefix=lambda prefix: previews.append(asyncio.ensure_future(quick_tempo_preview(prefix, file.size)))
+        )
+    except UploadTooLarge:
+        for task in previews:
+            task.cancel()
+        raise HTTPException(status_code=413, detail="File too large (max 200MB)")
+    except UploadRejected as e:
+        for task in previews:
+            task.cancel()
+        raise HTTPException(status_code=400, detail=f"Unsupported audio format: {e}")
+    except Exception as e:
+        for task in previews:
+            task.cancel()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    
+    file_size = upload.size
+    digest = upload.digest
+    # Whether the multipart upload has been completed or aborted; otherwise it must be aborted
+    settled = False
     
     try:
-        # Upload to S3
-        upload_url = upload_file_to_s3(content, file_key, file.content_type)
+        # Repeat uploads of a known track complete immediately with the cached analysis
+        cached = lookup_cached_analysis(digest, analysis_profile)
+        if cached:
+            for task in previews:
+                task.cancel()
+            settled = True
+            await upload.abort()
+            with get_db() as db:
+                job = AudioJob(
+                    id=job_id,
+                    user_id=user_id,
+                    filename=file.filename,
+                    file_size=file_size,
+                    processed_file_url=cached['processed_file_url'],
+                    renditions=cached.get('renditions') or legacy_renditions(cached['processed_file_url']),
+                    content_digest=digest,
+                    analysis_profile=analysis_profile,
+                    features=cached['features'],
+                    status=JobStatus.COMPLETED,
+                    progress=1.0,
+                    status_message="Audio processing completed (cached analysis)",
+                    created_at=datetime.utcnow()
+                )
+                db.add(job)
+                db.commit()
+            
+            return UploadResponse(
+                job_id=job_id,
+                message="File matched a previous analysis, results are ready"
+            )
+        
+        # Assemble the uploaded parts; the tempo probe has been running since the first bytes arrived
+        upload_url = await upload.complete()
+        settled = True
+        preview = await previews[0] if previews else None
         
         # Create job record
         with get_db() as db:
@@ -117,23 +274,199 @@ async def upload_audio(
                 filename=file.filename,
                 file_size=file_size,
                 file_url=upload_url,
+                content_digest=digest,
+                analysis_profile=analysis_profile,
+                features={'preview': preview.dict()} if preview else None,
                 status=JobStatus.PENDING,
+                status_message=DEFERRED_MESSAGE if defer_processing else None,
                 created_at=datetime.utcnow()
             )
             db.add(job)
             db.commit()
         
+        if defer_processing:
+            return UploadResponse(job_id=job_id, message="File uploaded, waiting for batch processing", preview=preview)
+        
         # Queue processing task
         process_audio_file.delay(job_id, file_key)
         
         return UploadResponse(
             job_id=job_id,
-            message="File uploaded successfully, processing started"
+            message="File uploaded successfully, processing started",
+            preview=preview
+        )
+        
+    except Exception as e:
+        for task in previews:
+            task.cancel()
+        if not settled:
+            try:
+                await upload.abort()
+            except Exception as abort_error:
+                logger.warning(f"Could not abort upload {file_key}: {abort_error}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+async def quick_tempo_preview(prefix: bytes, total_size: Optional[int]) -> Optional[TempoPreview]:
+    """Provisional tempo preview; skipped rather than delaying the upload response"""
+    
+    try:
+        preview = await asyncio.wait_for(
+            run_in_threadpool(probe_tempo, prefix, total_size),
+            timeout=PREVIEW_TIMEOUT
         )
+        return TempoPreview(**preview)
+    except Exception as e:
+        logger.info(f"Tempo preview skipped: {e}")
+        return None
+
+@app.post("/api/v1/uploads", response_model=DirectUploadResponse)
+async def create_direct_upload(request: DirectUploadRequest):
+    """Start an upload the client sends straight to storage through presigned part URLs"""
+    
+    if request.content_type not in ALLOWED_AUDIO_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported audio format")
+    if not 0 < request.size <= MAX_UPLOAD_BYTES:
+        if request.size > 0:
+            raise HTTPException(status_code=413, detail="File too large (max 200MB)")
+        raise HTTPException(status_code=400, detail="Empty file")
+    
+    job_id = str(uuid.uuid4())
+    file_key = f"uploads/{job_id}/{request.filename}"
+    # S3 allows at most 10000 parts per upload
+    part_size = max(S3_PART_SIZE, -(-request.size // 10000))
+    n_parts = -(-request.size // part_size)
+    
+    try:
+        upload = await run_in_threadpool(MultipartUpload, file_key, request.content_type)
+        parts = [UploadPart(part_number=number, url=upload.presign_part(number)) for number in range(1, n_parts + 1)]
+        
+        # Provisional job; the declared digest is checked by the worker once it has the bytes
+        with get_db() as db:
+            job = AudioJob(
+                id=job_id,
+                user_id=request.user_id,
+                filename=request.filename,
+                file_size=request.size,
+                content_digest=request.sha256,
+                upload_id=upload.upload_id,
+                analysis_profile=request.analysis_profile,
+                status=JobStatus.UPLOADING,
+                status_message="Waiting for upload",
+                created_at=datetime.utcnow()
+            )
+            db.add(job)
+            db.commit()
+        
+        return DirectUploadResponse(job_id=job_id, part_size=part_size, parts=parts, expires_in=PRESIGN_EXPIRY)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@app.post("/api/v1/uploads/{job_id}/complete", response_model=UploadResponse)
+async def complete_direct_upload(job_id: str, defer_processing: bool = Query(False)):
+    """Assemble a direct upload, verify its size, format and content type, and queue processing (or leave it for a batch)"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        # Only one of concurrent completes moves the job out of UPLOADING
+        claimed = db.query(AudioJob).filter(
+            AudioJob.id == job_id,
+            AudioJob.status == JobStatus.UPLOADING,
+            AudioJob.upload_id.isnot(None)
+        ).update({AudioJob.status: JobStatus.PENDING, AudioJob.status_message: "Assembling upload"}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Upload already completed or expired")
+        file_key = f"uploads/{job_id}/{job.filename}"
+        upload = MultipartUpload(file_key, upload_id=job.upload_id)
+        expected_size = job.file_size
+    
+    # The part list comes from storage, so clients need not report ETags
+    incomplete = None
+    try:
+        if await run_in_threadpool(upload.load_parts) == 0:
+            incomplete = "No parts uploaded"
+        else:
+            upload_url = await run_in_threadpool(upload.complete)
+    except Exception as e:
+        incomplete = f"Upload incomplete: {str(e)}"
+    if incomplete:
+        # Hand the upload back so the client can send the missing parts and retry
+        with get_db() as db:
+            db.query(AudioJob).filter(AudioJob.id == job_id).update(
+                {AudioJob.status: JobStatus.UPLOADING, AudioJob.status_message: "Waiting for upload"},
+                synchronize_session=False
+            )
+            db.commit()
+        raise HTTPException(status_code=400, detail=incomplete)
+    
+    # The parts are assembled now, so a failed check cannot hand the upload back; the job fails
+    problem = None
+    problem_status = 400
+    try:
+        info = await run_in_threadpool(object_info, file_key)
+        if not info or info['size'] != expected_size:
+            problem = f"Uploaded size does not match the declared {expected_size} bytes"
+        else:
+            sniffed = sniff_audio_format(await run_in_threadpool(download_range_from_s3, file_key, 0, 15))
+            if sniffed is None:
+                problem = "Unrecognized audio format"
+            elif sniffed != info['content_type']:
+                # The object carries the content type declared when the upload was created
+                problem = f"Uploaded {sniffed} audio does not match the declared {info['content_type']}"
+    except Exception as e:
+        problem = f"Upload could not be verified: {str(e)}"
+        problem_status = 502
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        job.upload_id = None
+        if problem:
+            job.status = JobStatus.FAILED
+            job.status_message = problem
+        else:
+            job.file_url = upload_url
+            job.status_message = DEFERRED_MESSAGE if defer_processing else None
+        db.commit()
+    
+    if problem:
+        await run_in_threadpool(delete_from_s3, file_key)
+        raise HTTPException(status_code=problem_status, detail=problem)
+    
+    if defer_processing:
+        return UploadResponse(job_id=job_id, message="File uploaded, waiting for batch processing")
+    
+    process_audio_file.delay(job_id, file_key)
+    
+    return UploadResponse(
+        job_id=job_id,
+        message="File uploaded successfully, processing started"
+    )
+
+@app.post("/api/v1/batches", response_model=BatchResponse)
+async def start_batch(request: BatchRequest):
+    """Analyze deferred uploads in batch tasks that share one warm beat engine per worker"""
+    
+    # Only uploaded jobs nobody has started; the tasks claim each job again before touching it
+    with get_db() as db:
+        ready = {
+            row.id for row in db.query(AudioJob.id).filter(
+                AudioJob.id.in_(request.job_ids),
+                AudioJob.status == JobStatus.PENDING,
+                AudioJob.file_url.isnot(None)
+            )
+        }
+    queued = [job_id for job_id in request.job_ids if job_id in ready]
+    skipped = [job_id for job_id in request.job_ids if job_id not in ready]
+    
+    task_ids = [
+        process_audio_batch.delay(queued[i:i + BATCH_MAX_JOBS]).id
+        for i in range(0, len(queued), BATCH_MAX_JOBS)
+    ]
+    return BatchResponse(queued=queued, skipped=skipped, task_ids=task_ids)
+
 @app.post("/api/v1/ingest-url", response_model=UploadResponse)
 async def ingest_url(request: URLIngestRequest):
     """Process audio from URL with rights confirmation"""
@@ -154,6 +487,7 @@ async def ingest_url(request: URLIngestRequest):
                 source_url=request.url,
                 rights_confirmed=request.confirm_rights,
                 metadata_only=request.metadata_only,
+                analysis_profile=request.analysis_profile,
                 status=JobStatus.PENDING,
                 created_at=datetime.utcnow()
             )
@@ -171,6 +505,36 @@ async def ingest_url(request: URLIngestRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"URL processing failed: {str(e)}")
 
+@app.post("/api/v1/jobs/{job_id}/profile", response_model=UploadResponse)
+async def upgrade_job_profile(job_id: str, request: ProfileUpgradeRequest):
+    """Re-analyze a processed job under a more complete analysis profile"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        if job.status != JobStatus.COMPLETED or not job.processed_file_url:
+            raise HTTPException(status_code=400, detail="Job must be completed before upgrading its profile")
+        
+        current = job.analysis_profile or AnalysisProfile.FULL
+        if profile_rank(request.analysis_profile) <= profile_rank(current):
+            raise HTTPException(status_code=400, detail=f"Job already has the '{current}' profile")
+        
+        job.analysis_profile = request.analysis_profile
+        job.status = JobStatus.PENDING
+        job.progress = 0.0
+        job.status_message = f"Queued for '{request.analysis_profile.value}' analysis"
+        db.commit()
+    
+    # Reanalysis reads the stored processed audio, so nothing is uploaded again
+    reanalyze_audio_job.delay(job_id)
+    
+    return UploadResponse(
+        job_id=job_id,
+        message=f"Upgrading analysis to '{request.analysis_profile.value}'"
+    )
+
 @app.get("/api/v1/jobs/{job_id}/status", response_model=JobStatusResponse)
 async def get_job_status(job_id: str):
     """Get job processing status"""
@@ -185,14 +549,29 @@ async def get_job_status(job_id: str):
             status=job.status,
             progress=job.progress or 0.0,
             message=job.status_message or "",
+            ready_stages=job.ready_stages(),
             created_at=job.created_at,
             updated_at=job.updated_at or job.created_at
         )
 
 @app.get("/api/v1/jobs/{job_id}/features")
-async def get_job_features(job_id: str):
+async def get_job_features(
+    job_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields, e.g. bpm,bars,sections"),
+    start: Optional[float] = Query(None, ge=0, description="Window start in seconds for time-indexed fields"),
+    end: Optional[float] = Query(None, ge=0, description="Window end in seconds for time-indexed fields")
+):
     """Get extracted audio features"""
     
+    selected = None
+    if fields:
+        selected = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = sorted(set(selected) - FEATURE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown feature fields: {', '.join(unknown)}")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    
     with get_db() as db:
         job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
         if not job:
@@ -204,7 +583,125 @@ async def get_job_features(job_id: str):
         if not job.features:
             raise HTTPException(status_code=404, detail="Features not found")
         
-        return job.features
+        stored_features = job.features
+    
+    # Per-beat arrays live in object storage and are rebuilt on demand, only for the selection
+    return await run_in_threadpool(load_features, stored_features, selected, start, end)
+
+@app.get("/api/v1/jobs/{job_id}/position", response_model=TimelinePosition)
+async def get_timeline_position(job_id: str, time: float = Query(..., ge=0, description="Playback time in seconds")):
+    """Bar, beat and section under a playback time, e.g. to follow the playhead"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status != JobStatus.COMPLETED or not job.features:
+            raise HTTPException(status_code=400, detail="Job not completed yet")
+        stored_features = job.features
+    
+    features = await run_in_threadpool(load_features, stored_features, ['beats', 'bars', 'sections'])
+    timeline = TimelineIndex.from_features(features)
+    section = int(timeline.section_at(time))
+    section_info = features.get('sections', [])[section] if section >= 0 else {}
+    
+    return TimelinePosition(
+        time=time,
+        section=section,
+        section_name=section_info.get('name'),
+        section_label=section_info.get('label'),
+        **timeline.position(time)
+    )
+
+@app.get("/api/v1/jobs/{job_id}/waveform")
+async def get_job_waveform(
+    job_id: str,
+    zoom: Optional[int] = Query(None, ge=0, description="Pyramid level (0 = finest); chosen from width when omitted"),
+    start: float = Query(0.0, ge=0),
+    end: Optional[float] = Query(None, ge=0),
+    width: int = Query(2000, ge=1, le=20000, description="Maximum peaks to return when zoom is omitted"),
+    format: str = Query("json", pattern="^(json|binary)$")
+):
+    """Waveform min/max peaks for a zoom level and time range, with beat and bar markers"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if not job.processed_file_url:
+            raise HTTPException(status_code=404, detail="Waveform not available")
+        
+        peaks_key = waveform_key(key_from_url(job.processed_file_url))
+        stored_features = job.features
+    
+    # Only the header and the requested peak range are read from storage
+    try:
+        header = await run_in_threadpool(fetch_header, peaks_key)
+    except (RuntimeError, ValueError):
+        raise HTTPException(status_code=404, detail="Waveform not available")
+    
+    sample_rate = header['sample_rate']
+    end = header['n_samples'] / sample_rate if end is None else end
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    level = select_level(header, start, end, width) if zoom is None else zoom
+    if level >= len(header['levels']):
+        raise HTTPException(status_code=400, detail=f"zoom must be below {len(header['levels'])}")
+    
+    lo, hi = peak_range(header, level, start, end)
+    data = b''
+    if hi > lo:
+        data = await run_in_threadpool(download_range_from_s3, peaks_key, *byte_range(header, level, lo, hi))
+    samples_per_peak = header['levels'][level]['samples_per_peak']
+    
+    if format == "binary":
+        # Interleaved int8 (min, max) pairs
+        return Response(content=data, media_type="application/octet-stream", headers={
+            'X-Sample-Rate': str(sample_rate),
+            'X-Samples-Per-Peak': str(samples_per_peak),
+            'X-Start-Index': str(lo),
+            'X-Zoom-Levels': str(len(header['levels']))
+        })
+    
+    markers = {}
+    if stored_features:
+        markers = await run_in_threadpool(load_features, stored_features, ['beats', 'downbeats', 'bars'], start, end)
+    
+    # audiowaveform-style JSON, which wavesurfer.js can draw directly
+    return {
+        'version': 2,
+        'channels': 1,
+        'bits': 8,
+        'sample_rate': sample_rate,
+        'samples_per_pixel': samples_per_peak,
+        'zoom': level,
+        'zoom_levels': len(header['levels']),
+        'start_index': lo,
+        'length': hi - lo,
+        'data': list(memoryview(data).cast('b')),
+        'beats': [beat['timestamp'] for beat in markers.get('beats', [])],
+        'downbeats': [downbeat['timestamp'] for downbeat in markers.get('downbeats', [])],
+        'bars': [bar['start'] for bar in markers.get('bars', [])]
+    }
+
+@app.get("/api/v1/jobs/{job_id}/audio")
+async def get_job_audio(
+    job_id: str,
+    rendition: str = Query("playback", pattern="^(playback|archival)$")
+):
+    """Redirect to the processed audio; the playback rendition falls back to the archival one"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        renditions = job.renditions or legacy_renditions(job.processed_file_url)
+    
+    if not renditions:
+        raise HTTPException(status_code=404, detail="Processed audio not available")
+    chosen = renditions.get(rendition) or renditions['archival']
+    url = await run_in_threadpool(presign_download, key_from_url(chosen['url']))
+    return RedirectResponse(url, status_code=307)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
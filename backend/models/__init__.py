@@ -1,10 +1,10 @@
-from .audio import AudioJob, JobStatus, AudioFeatures
+from .audio import AudioJob, JobStatus, AudioFeatures, AnalysisCacheEntry, AnalysisProfile
 from .user import User, UserRole
 from .generation import Generation, GenerationStatus, LyricLine, LyricSection
 from .feedback import Feedback, FeedbackType
 
 __all__ = [
-    'AudioJob', 'JobStatus', 'AudioFeatures',
+    'AudioJob', 'JobStatus', 'AudioFeatures', 'AnalysisCacheEntry', 'AnalysisProfile',
     'User', 'UserRole', 
     'Generation', 'GenerationStatus', 'LyricLine', 'LyricSection',
     'Feedback', 'FeedbackType'
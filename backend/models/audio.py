@@ -9,7 +9,32 @@ import uuid
 
 Base = declarative_base()
 
+# Bump whenever analysis output changes so cached features are recomputed
+ANALYSIS_VERSION = "1.3.0"
+
+# Analysis stages in the order their results are usually published
+ANALYSIS_STAGES = ['beats', 'key', 'structure', 'spectral']
+
+# Stages lyric generation reads from (bpm/bars, key, sections)
+GENERATION_REQUIRED_STAGES = ['beats', 'key', 'structure']
+
+class AnalysisProfile(str, Enum):
+    FAST = "fast"          # tempo, beats and bars only (aubio)
+    STANDARD = "standard"  # + madmom beats, key and structure
+    FULL = "full"          # + per-beat spectral features
+
+# Stages each profile runs, from cheapest to most complete profile
+PROFILE_STAGES = {
+    AnalysisProfile.FAST: ['beats'],
+    AnalysisProfile.STANDARD: ['beats', 'key', 'structure'],
+    AnalysisProfile.FULL: list(ANALYSIS_STAGES),
+}
+
+def profile_rank(profile: str) -> int:
+    return list(PROFILE_STAGES).index(AnalysisProfile(profile))
+
 class JobStatus(str, Enum):
+    UPLOADING = "uploading"  # waiting for a direct-to-storage upload to complete
     PENDING = "pending"
     PROCESSING = "processing"
     COMPLETED = "completed"
@@ -25,6 +50,9 @@ class AudioJob(Base):
     file_size = Column(Integer, nullable=True)
     file_url = Column(String, nullable=True)
     processed_file_url = Column(String, nullable=True)
+    renditions = Column(JSON, nullable=True)  # {"archival": {url, codec, content_type, size}, "playback": {...}}
+    content_digest = Column(String, nullable=True, index=True)
+    upload_id = Column(String, nullable=True)  # multipart upload of a presigned direct upload
     
     # Rights and legal
     rights_confirmed = Column(Boolean, default=False)
@@ -35,13 +63,48 @@ class AudioJob(Base):
     status = Column(String, default=JobStatus.PENDING)
     progress = Column(Float, default=0.0)
     status_message = Column(Text, nullable=True)
+    analysis_profile = Column(String, default=AnalysisProfile.FULL)
     
-    # Audio features (JSON)
+    # Audio features (JSON), published stage by stage
     features = Column(JSON, nullable=True)
+    feature_readiness = Column(JSON, nullable=True)  # {"beats": true, "key": true, ...}
+    stage_timings = Column(JSON, nullable=True)  # {"profile", "duration_bucket", "stages": {name: {stage, rendition, wall_time, cpu_time, peak_rss_delta}}}
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    
+    def profile_stages(self) -> List[str]:
+        """Analysis stages the job's profile runs"""
+        return PROFILE_STAGES[AnalysisProfile(self.analysis_profile or AnalysisProfile.FULL)]
+    
+    def ready_stages(self) -> List[str]:
+        """Analysis stages whose results are already in features"""
+        if self.status == JobStatus.COMPLETED and self.features:
+            return self.profile_stages()
+        readiness = self.feature_readiness or {}
+        return [stage for stage in ANALYSIS_STAGES if readiness.get(stage)]
+    
+    def generation_stages(self) -> List[str]:
+        """Stages lyric generation waits for under this job's profile"""
+        return [stage for stage in GENERATION_REQUIRED_STAGES if stage in self.profile_stages()]
+    
+    def stages_ready(self, stages: List[str]) -> bool:
+        ready = self.ready_stages()
+        return all(stage in ready for stage in stages)
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+    
+    # SHA-256 of the uploaded bytes, or "pcm:<sha256>" of the decoded master-rate PCM
+    digest = Column(String, primary_key=True)
+    analysis_version = Column(String, primary_key=True)
+    features = Column(JSON, nullable=False)
+    processed_file_url = Column(String, nullable=True)
+    renditions = Column(JSON, nullable=True)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, nullable=True)
 
 # Pydantic models for API responses
 class Beat(BaseModel):
@@ -60,11 +123,20 @@ class Bar(BaseModel):
 
 class Section(BaseModel):
     name: str  # intro, verse, chorus, bridge, outro
+    label: Optional[str] = None  # repetition label; sections that repeat each other share it (A, B, ...)
     start: float
     end: float
     bars: List[int]  # bar indices
     confidence: float
 
+class BarHarmony(BaseModel):
+    start: float
+    end: float
+    chord: str  # e.g. "C", "Am"; "N" for no chord
+    chord_confidence: float
+    key: str  # local key, e.g. "G major"
+    beat_chords: List[str]  # chord of each beat in the bar
+
 class SpectralFeatures(BaseModel):
     timestamp: float
     energy: float
@@ -83,10 +155,12 @@ class AudioFeatures(BaseModel):
     bpm: float
     tempo_confidence: float
     time_signature: Optional[str]
+    beat_tracking_path: Optional[str] = None
     
     # Key and harmony
     key: Optional[str]
     key_confidence: Optional[float]
+    harmony: List[BarHarmony] = []  # per-bar chord and local key timeline
     
     # Beat tracking
     beats: List[Beat]
@@ -94,13 +168,14 @@ class AudioFeatures(BaseModel):
     bars: List[Bar]
     
     # Structure
-    sections: List[Section]
+    sections: List[Section] = []
     
     # Spectral features per beat
-    spectral_features: List[SpectralFeatures]
+    spectral_features: List[SpectralFeatures] = []
     
     # Analysis metadata
     analysis_version: str
+    analysis_profile: Optional[str] = None
     processing_time: float
     
 class AudioMetadata(BaseModel):
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.metrics import f_measure, section_label_agreement
+from benchmarks.synthetic import STANDARD_CORPUS, ground_truth, render_track
+from utils.audio_analysis import create_bar_structure, segment_structure
+from utils.audio_decode import MASTER_SAMPLE_RATE
+from utils.feature_cache import AudioFeatureCache
+
+# Lowest scores any standard corpus track may drop to; repeats must share a label
+MIN_LABEL_F = 0.75
+MIN_BOUNDARY_F = 0.8
+BOUNDARY_WINDOW = 3.0
+
+@pytest.mark.parametrize('spec', STANDARD_CORPUS, ids=[spec['name'] for spec in STANDARD_CORPUS])
+def test_segmentation_on_synthetic_tracks(spec):
+    """Sections found on ground-truth bars match the synthetic arrangement"""
+
+    truth = ground_truth(spec)
+    y = render_track(spec, MASTER_SAMPLE_RATE)
+    bars = create_bar_structure(truth['beat_times'], truth['downbeat_times'], spec['beats_per_bar'])
+    sections = segment_structure(y, MASTER_SAMPLE_RATE, bars, AudioFeatureCache(y, MASTER_SAMPLE_RATE))
+
+    boundary_f = f_measure(truth['section_boundaries'], [section.start for section in sections[1:]], BOUNDARY_WINDOW)
+    assert boundary_f >= MIN_BOUNDARY_F
+    assert section_label_agreement(truth, sections) >= MIN_LABEL_F
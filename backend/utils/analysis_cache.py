@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from database import get_db
+from models.audio import AnalysisCacheEntry, AnalysisProfile, ANALYSIS_VERSION, PROFILE_STAGES, profile_rank
+from utils.feature_store import offload_feature_arrays
+
+logger = logging.getLogger(__name__)
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def pcm_digest(y: np.ndarray) -> str:
+    """Digest of decoded master-rate PCM, so re-encodes of the same audio share an entry"""
+    return "pcm:" + hashlib.sha256(np.ascontiguousarray(y).tobytes()).hexdigest()
+
+def cache_version(profile: str) -> str:
+    """Cache key version: results differ per analysis version and profile"""
+    return f"{ANALYSIS_VERSION}/{AnalysisProfile(profile).value}"
+
+def lookup_cached_analysis(digest: str, profile: str = AnalysisProfile.FULL) -> Optional[Dict[str, Any]]:
+    """Return cached features and processed audio URL for a digest, if any.
+
+    An entry from a more complete profile also satisfies a cheaper one.
+    """
+    
+    versions = [
+        cache_version(candidate) for candidate in PROFILE_STAGES
+        if profile_rank(candidate) >= profile_rank(profile)
+    ]
+    
+    with get_db() as db:
+        entry = db.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.digest == digest,
+            AnalysisCacheEntry.analysis_version.in_(versions)
+        ).first()
+        if not entry:
+            return None
+        
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_hit_at = datetime.utcnow()
+        db.commit()
+        
+        return {
+            'features': entry.features,
+            'processed_file_url': entry.processed_file_url,
+            'renditions': entry.renditions
+        }
+
+def store_cached_analysis(digest: str, features: Dict[str, Any], processed_file_url: Optional[str],
+                          profile: str = AnalysisProfile.FULL, renditions: Optional[Dict[str, Any]] = None):
+    """Remember the analysis of a digest; an existing entry is left untouched"""
+    
+    analysis_version = cache_version(profile)
+    try:
+        features = offload_feature_arrays(features)
+        with get_db() as db:
+            exists = db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.digest == digest,
+                AnalysisCacheEntry.analysis_version == analysis_version
+            ).first()
+            if exists:
+                return
+            
+            db.add(AnalysisCacheEntry(
+                digest=digest,
+                analysis_version=analysis_version,
+                features=features,
+                processed_file_url=processed_file_url,
+                renditions=renditions,
+                hit_count=0,
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+    except Exception as e:
+        # A concurrent job may have stored the same digest first; the cache is best effort
+        logger.warning(f"Failed to store analysis cache entry {digest}: {e}")
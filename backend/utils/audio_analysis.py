@@ -1,42 +1,27 @@
-import librosa
-import madmom
-import aubio
 import numpy as np
-from typing import Dict, List, Tuple, Any
-from models.audio import Bar, Section, SpectralFeatures
+from typing import Dict, List, Tuple, Any, Optional
+from models.audio import Bar, BarHarmony, Section, SpectralFeatures
+from utils.feature_cache import AudioFeatureCache
+from utils.interval_index import IntervalIndex
+from utils.beat_engine import BeatEngine, get_beat_engine, track_beats_from_onsets, track_beats_aubio
 
-def extract_beats_and_tempo(y: np.ndarray, sr: int) -> Dict[str, Any]:
+def extract_beats_and_tempo(y: np.ndarray, sr: int, cache: Optional[AudioFeatureCache] = None,
+                            engine: Optional[BeatEngine] = None, use_madmom: bool = True) -> Dict[str, Any]:
     """Extract beats, tempo, and bar structure using librosa and madmom"""
     
-    # Use madmom for more accurate beat tracking
-    proc = madmom.features.beats.DBNBeatTrackingProcessor(fps=100)
-    act = madmom.features.beats.RNNBeatProcessor()(y)
-    beat_times = proc(act)
-    
-    # Estimate tempo
-    tempo, beats_librosa = librosa.beat.beat_track(y=y, sr=sr, units='time')
-    
-    # Use madmom beats but librosa tempo as fallback
-    if len(beat_times) == 0:
-        beat_times = beats_librosa
-        tempo_confidence = 0.5
+    if y is None and cache is not None:
+        # Streamed analysis keeps no signal for madmom, only per-frame summaries
+        tracking = track_beats_from_onsets(cache)
+    elif not use_madmom:
+        tracking = track_beats_aubio(y, sr)
     else:
-        # Calculate tempo from madmom beats
-        if len(beat_times) > 1:
-            intervals = np.diff(beat_times)
-            tempo = 60.0 / np.median(intervals)
-            tempo_confidence = 1.0 - np.std(intervals) / np.mean(intervals)
-        else:
-            tempo_confidence = 0.3
-    
-    # Detect downbeats using madmom
-    downbeat_proc = madmom.features.downbeats.DBNDownBeatTrackingProcessor(beats_per_bar=[4], fps=100)
-    downbeat_act = madmom.features.downbeats.RNNDownBeatProcessor()(y)
-    downbeats = downbeat_proc(downbeat_act)
+        # One madmom downbeat RNN pass; librosa only runs if madmom yields no tempo
+        engine = engine or get_beat_engine()
+        tracking = engine.track(y, sr, cache)
     
-    # Extract downbeat times and beat positions
-    downbeat_times = downbeats[:, 0] if len(downbeats) > 0 else []
-    beat_positions = downbeats[:, 1] if len(downbeats) > 0 else []
+    beat_times = tracking['beat_times']
+    downbeat_times = tracking['downbeat_times']
+    beat_positions = tracking['beat_positions']
     
     # Estimate time signature from beat positions
     if len(beat_positions) > 0:
@@ -55,8 +40,9 @@ def extract_beats_and_tempo(y: np.ndarray, sr: int) -> Dict[str, Any]:
     downbeat_confidences = np.ones(len(downbeat_times)) * 0.7
     
     return {
-        'bpm': float(tempo),
-        'tempo_confidence': float(tempo_confidence),
+        'bpm': tracking['bpm'],
+        'tempo_confidence': tracking['tempo_confidence'],
+        'beat_tracking_path': tracking['path'],
         'time_signature': time_signature,
         'beat_times': beat_times.tolist(),
         'beat_confidences': beat_confidences.tolist(),
@@ -65,123 +51,413 @@ def extract_beats_and_tempo(y: np.ndarray, sr: int) -> Dict[str, Any]:
         'bars': bars
     }
 
-def extract_key_and_harmony(y: np.ndarray, sr: int) -> Dict[str, Any]:
-    """Extract key and harmonic information using librosa"""
+KEY_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# Krumhansl-Kessler key profiles, tonic first
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# All 24 keys (major, then minor) as z-scored profiles, so one matrix product correlates a chroma vector with every key
+KEY_LABELS = [f"{name} major" for name in KEY_NAMES] + [f"{name} minor" for name in KEY_NAMES]
+KEY_TEMPLATES = np.array([np.roll(MAJOR_PROFILE, i) for i in range(12)] + [np.roll(MINOR_PROFILE, i) for i in range(12)])
+KEY_TEMPLATES = (KEY_TEMPLATES - KEY_TEMPLATES.mean(axis=1, keepdims=True)) / KEY_TEMPLATES.std(axis=1, keepdims=True)
+
+# Major and minor triad templates, unit length, labelled like "C" and "Am"
+CHORD_LABELS = list(KEY_NAMES) + [f"{name}m" for name in KEY_NAMES]
+CHORD_TEMPLATES = np.array(
+    [np.roll([1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0], i) for i in range(12)] +
+    [np.roll([1, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0], i) for i in range(12)],
+    dtype=np.float64
+) / np.sqrt(3)
+NO_CHORD = "N"
+
+# A flat chroma vector scores 0.5 against every triad; anything close to that is no chord
+MIN_CHORD_SCORE = 0.6
+
+# Bars each local key estimate looks at, and bars a new key must hold before it counts as a change
+KEY_WINDOW_BARS = 8
+KEY_CHANGE_MIN_BARS = 4
+
+def extract_key_and_harmony(y: np.ndarray, sr: int, cache: Optional[AudioFeatureCache] = None,
+                            beat_times: Optional[List[float]] = None, bars: Optional[List[Bar]] = None) -> Dict[str, Any]:
+    """Global key plus a per-bar chord and key timeline from beat-synchronous chroma"""
     
-    # Chromagram for key detection
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+    cache = cache or AudioFeatureCache(y, sr)
+    if not beat_times or not bars:
+        key, confidence = estimate_key(np.mean(cache.chroma, axis=1))
+        return {'key': key, 'confidence': confidence, 'harmony': []}
     
-    # Key detection using template matching
-    key_templates = librosa.key_to_notes(['C:maj', 'C:min', 'C#:maj', 'C#:min', 
-                                         'D:maj', 'D:min', 'D#:maj', 'D#:min',
-                                         'E:maj', 'E:min', 'F:maj', 'F:min',
-                                         'F#:maj', 'F#:min', 'G:maj', 'G:min',
-                                         'G#:maj', 'G#:min', 'A:maj', 'A:min',
-                                         'A#:maj', 'A#:min', 'B:maj', 'B:min'])
+    # Everything below works on one chroma column per beat rather than per frame
+    beat_times = np.asarray(beat_times, dtype=np.float64)
+    beat_chroma = beat_synchronous_chroma(cache, beat_times)
+    key, confidence = estimate_key(beat_chroma.mean(axis=1))
     
-    # Simple key detection (can be improved with more sophisticated methods)
-    chroma_mean = np.mean(chroma, axis=1)
+    bar_starts = np.array([bar.start for bar in bars])
+    bar_ends = np.array([bar.end for bar in bars])
+    first_beat = np.searchsorted(beat_times, bar_starts - 1e-3)
+    end_beat = np.searchsorted(beat_times, bar_ends - 1e-3)
+    cumulative = np.concatenate([np.zeros((12, 1)), np.cumsum(beat_chroma, axis=1)], axis=1)
+    bar_chroma = cumulative[:, end_beat] - cumulative[:, first_beat]
     
-    # Find the most prominent pitch class
-    key_idx = np.argmax(chroma_mean)
-    key_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+    beat_chords, _ = estimate_chords(beat_chroma)
+    bar_chords, bar_scores = estimate_chords(bar_chroma)
+    bar_keys = estimate_key_timeline(bar_chroma)
     
-    # Determine major/minor (simplified heuristic)
-    # This is a basic implementation - real key detection is more complex
-    major_profile = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-    minor_profile = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+    harmony = [
+        BarHarmony(
+            start=float(bar_starts[i]),
+            end=float(bar_ends[i]),
+            chord=bar_chords[i],
+            chord_confidence=float(bar_scores[i]),
+            key=bar_keys[i],
+            beat_chords=beat_chords[first_beat[i]:end_beat[i]]
+        )
+        for i in range(len(bars))
+    ]
+    return {'key': key, 'confidence': confidence, 'harmony': harmony}
+
+def beat_synchronous_chroma(cache: AudioFeatureCache, beat_times: np.ndarray) -> np.ndarray:
+    """Mean chroma of each beat (12 x n_beats); the last beat lasts as long as the median beat"""
     
-    # Rotate profiles to match detected key
-    major_rotated = np.roll(major_profile, key_idx)
-    minor_rotated = np.roll(minor_profile, key_idx)
+    chroma = cache.chroma
+    n_frames = chroma.shape[1]
+    frames = np.clip(cache.time_to_frames(beat_times), 0, n_frames - 1)
+    period = int(np.median(np.diff(frames))) if len(frames) > 1 else 1
+    bounds = np.append(frames, min(frames[-1] + max(period, 1), n_frames))
     
-    major_correlation = np.corrcoef(chroma_mean, major_rotated)[0, 1]
-    minor_correlation = np.corrcoef(chroma_mean, minor_rotated)[0, 1]
+    # Sums over explicit [start, end) spans; reduceat would run the last beat to the end of the track
+    cumulative = np.concatenate([np.zeros((chroma.shape[0], 1)), np.cumsum(chroma, axis=1)], axis=1)
+    counts = np.maximum(np.diff(bounds), 1)
+    return (cumulative[:, bounds[1:]] - cumulative[:, bounds[:-1]]) / counts
+
+def estimate_chords(chroma: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Best-matching triad of each chroma column and its cosine score"""
     
-    if major_correlation > minor_correlation:
-        key = f"{key_names[key_idx]} major"
-        confidence = float(major_correlation)
-    else:
-        key = f"{key_names[key_idx]} minor"
-        confidence = float(minor_correlation)
+    unit = chroma / np.maximum(np.linalg.norm(chroma, axis=0), 1e-9)
+    scores = CHORD_TEMPLATES @ unit
+    best = np.argmax(scores, axis=0)
+    best_scores = scores[best, np.arange(scores.shape[1])]
+    labels = [CHORD_LABELS[i] if score >= MIN_CHORD_SCORE else NO_CHORD for i, score in zip(best, best_scores)]
+    return labels, best_scores
+
+def estimate_key_timeline(bar_chroma: np.ndarray, window: int = KEY_WINDOW_BARS,
+                          min_bars: int = KEY_CHANGE_MIN_BARS) -> List[str]:
+    """Local key of each bar from a window of bars around it, ignoring modulations shorter than min_bars"""
     
-    return {
-        'key': key,
-        'confidence': max(0.0, min(1.0, confidence))  # Clamp to [0, 1]
-    }
+    n_bars = bar_chroma.shape[1]
+    # Window sums of every bar at once from cumulative sums
+    unit = bar_chroma / np.maximum(bar_chroma.sum(axis=0), 1e-9)
+    cumulative = np.concatenate([np.zeros((12, 1)), np.cumsum(unit, axis=1)], axis=1)
+    centers = np.arange(n_bars)
+    lo = np.clip(centers - window // 2, 0, n_bars)
+    hi = np.clip(centers + (window + 1) // 2, 0, n_bars)
+    windows = cumulative[:, hi] - cumulative[:, lo]
+    
+    windows = (windows - windows.mean(axis=0)) / np.maximum(windows.std(axis=0), 1e-9)
+    local = np.argmax(KEY_TEMPLATES @ windows, axis=0)
+    
+    # Runs of a local key shorter than min_bars take the key before them (a short opening run, the key after it)
+    changes = np.flatnonzero(np.diff(local)) + 1
+    starts = np.concatenate([[0], changes])
+    ends = np.concatenate([changes, [n_bars]])
+    keys = local.copy()
+    for start, end in zip(starts[1:], ends[1:]):
+        if end - start < min_bars:
+            keys[start:end] = keys[start - 1]
+    if len(starts) > 1 and ends[0] < min_bars:
+        keys[:ends[0]] = keys[ends[0]]
+    return [KEY_LABELS[k] for k in keys]
 
-def segment_structure(y: np.ndarray, sr: int, bars: List[Bar]) -> List[Section]:
-    """Segment audio into structural sections using spectral features"""
+def estimate_key(chroma_mean: np.ndarray) -> Tuple[str, float]:
+    """Key label and confidence for an averaged 12-bin chroma vector"""
     
-    # Extract features for segmentation
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+    # Pearson correlation with all 24 rotated Krumhansl-Kessler profiles
+    z = (chroma_mean - chroma_mean.mean()) / max(float(chroma_mean.std()), 1e-9)
+    correlations = KEY_TEMPLATES @ z / 12
+    best = int(np.argmax(correlations))
+    return KEY_LABELS[best], max(0.0, min(1.0, float(correlations[best])))  # Clamp to [0, 1]
+
+# Bars per phrase the section descriptors summarize, the most section types a track is split
+# into, and the shortest run of bars that stands as a section of its own
+SEGMENT_PHRASE_BARS = 4
+SEGMENT_MAX_LABELS = 6
+MIN_SECTION_BARS = 2
+# Weight of the timbre summary against the chord transitions in a phrase descriptor, and the
+# bars along each diagonal of the recurrence matrix that repeated runs are smoothed over
+SEGMENT_TIMBRE_WEIGHT = 0.25
+SEGMENT_DIAGONAL_BARS = 3
+
+def segment_structure(y: np.ndarray, sr: int, bars: List[Bar], cache: Optional[AudioFeatureCache] = None) -> List[Section]:
+    """Segment bars into sections, labelling repeats alike, by spectral clustering of a bar-level recurrence graph"""
     
-    # Combine features
-    features = np.vstack([mfcc, chroma, spectral_contrast])
+    cache = cache or AudioFeatureCache(y, sr)
+    if not bars:
+        return []
     
-    # Use librosa's segment boundaries
-    boundaries = librosa.segment.agglomerative(features, k=None)
-    boundary_times = librosa.frames_to_time(boundaries, sr=sr)
+    timbre, transitions, energy = bar_synchronous_features(cache, bars)
+    embedded = phrase_embedding(transitions, timbre, SEGMENT_PHRASE_BARS)
+    similarity = self_similarity(embedded)
+    # Every section type needs at least a phrase of its own
+    max_labels = min(SEGMENT_MAX_LABELS, len(bars) // SEGMENT_PHRASE_BARS)
+    boundaries, labels = label_runs(repetition_clusters(embedded, max_labels), MIN_SECTION_BARS)
+    confidences = repetition_confidences(similarity, boundaries, labels)
+    names = name_sections(labels, boundaries, energy)
     
-    # Map boundaries to bars
-    sections = []
-    section_names = ['intro', 'verse', 'chorus', 'verse', 'chorus', 'bridge', 'chorus', 'outro']
+    return [
+        Section(
+            name=name,
+            label=label,
+            start=bars[lo].start,
+            end=bars[hi - 1].end,
+            bars=list(range(lo, hi)),
+            confidence=confidence
+        )
+        for name, label, confidence, lo, hi in zip(names, labels, confidences, boundaries[:-1], boundaries[1:])
+    ]
+
+def bar_synchronous_features(cache: AudioFeatureCache, bars: List[Bar]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Standardized timbre features per bar (n_bars x d), the chord transition from each bar
+    to the next (n_bars x 144) and the mean energy of each bar"""
     
-    for i, (start_time, end_time) in enumerate(zip(boundary_times[:-1], boundary_times[1:])):
-        # Find bars that overlap with this section
-        section_bars = []
-        for j, bar in enumerate(bars):
-            if bar.start >= start_time and bar.end <= end_time:
-                section_bars.append(j)
-        
-        if section_bars:  # Only add sections with bars
-            section_name = section_names[i % len(section_names)]
-            sections.append(Section(
-                name=section_name,
-                start=start_time,
-                end=end_time,
-                bars=section_bars,
-                confidence=0.7  # Simplified confidence
-            ))
+    groups = [cache.mfcc, cache.spectral_contrast]
+    n_frames = min(group.shape[1] for group in groups + [cache.chroma])
+    stacked = np.vstack([group[:, :n_frames] for group in groups] + [cache.frame_energy[None, :n_frames], cache.chroma[:, :n_frames]])
     
-    return sections
+    # Bar means of every row at once from cumulative sums over frames
+    edges = np.clip(cache.time_to_frames([bar.start for bar in bars] + [bars[-1].end]), 0, n_frames)
+    lo, hi = edges[:-1], np.maximum(edges[1:], edges[:-1] + 1)
+    cumulative = np.concatenate([np.zeros((len(stacked), 1)), np.cumsum(stacked, axis=1)], axis=1)
+    means = (cumulative[:, np.minimum(hi, n_frames)] - cumulative[:, lo]) / (hi - lo)
+    
+    n_timbre = sum(len(group) for group in groups) + 1
+    timbre, chroma = means[:n_timbre], means[n_timbre:].T
+    energy = timbre[-1].copy()
+    timbre = (timbre - timbre.mean(axis=1, keepdims=True)) / np.maximum(timbre.std(axis=1, keepdims=True), 1e-9)
+    # Each feature group weighs the same, however many rows it has
+    sizes = [len(group) for group in groups] + [1]
+    weights = np.repeat([1 / np.sqrt(size) for size in sizes], sizes)
+    
+    # Sections often share chords and differ in their order, which the transitions keep
+    chroma = chroma / np.maximum(np.linalg.norm(chroma, axis=1, keepdims=True), 1e-9)
+    following = np.vstack([chroma[1:], chroma[-1:]])
+    transitions = (chroma[:, :, None] * following[:, None, :]).reshape(len(chroma), -1)
+    return (timbre * weights[:, None]).T, transitions, energy
 
-def extract_spectral_features(y: np.ndarray, sr: int, beat_times: List[float]) -> List[SpectralFeatures]:
-    """Extract spectral features aligned to beats"""
+def phrase_embedding(transitions: np.ndarray, timbre: np.ndarray, phrase: int) -> np.ndarray:
+    """Mean chord transitions and timbre over the phrase around each bar.
+
+    A phrase mean is the same wherever in a repeated progression a bar falls, so every bar
+    of a section resembles every bar of its repeats, not only the one at the same position.
+    """
+    
+    index = np.clip(np.arange(len(transitions))[:, None] + np.arange(phrase)[None, :] - phrase // 2, 0, len(transitions) - 1)
+    blocks = []
+    for features, weight in ((transitions, 1.0), (timbre, SEGMENT_TIMBRE_WEIGHT)):
+        means = features[index].mean(axis=1)
+        means -= means.mean(axis=0)
+        # Scaled so both blocks have rows of the same typical length before weighting
+        blocks.append(weight * means / max(np.linalg.norm(means, axis=1).mean(), 1e-9))
+    return np.hstack(blocks)
+
+def self_similarity(features: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every pair of rows, mapped to 0..1"""
+    unit = features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-9)
+    return (unit @ unit.T + 1) / 2
+
+def diagonal_smooth(matrix: np.ndarray, width: int) -> np.ndarray:
+    """Mean of each entry and its neighbours along the diagonal, so runs of repeated bars
+    reinforce each other and isolated matches fade"""
     
-    features = []
+    n = len(matrix)
+    total, count = np.zeros_like(matrix), np.zeros_like(matrix)
+    for shift in range(-(width // 2), width // 2 + 1):
+        lo, hi = max(shift, 0), n + min(shift, 0)
+        total[lo - shift:hi - shift, lo - shift:hi - shift] += matrix[lo:hi, lo:hi]
+        count[lo - shift:hi - shift, lo - shift:hi - shift] += 1
+    return total / count
+
+def repetition_clusters(embedded: np.ndarray, max_labels: int) -> np.ndarray:
+    """Cluster index of each bar from the low eigenvectors of a recurrence-plus-succession graph.
+
+    Bars are linked to their mutual nearest neighbours anywhere in the track (repetition)
+    and to the next bar (continuity), balanced so both kinds of link weigh about the same.
+    The number of clusters, up to max_labels, is where the eigenvalues jump the most.
+    """
+    
+    n_bars = len(embedded)
+    max_labels = min(max_labels, n_bars)
+    if max_labels < 2:
+        return np.zeros(n_bars, dtype=int)
+    
+    # Squared distances through the Gram matrix: no n_bars x n_bars x dims temporary
+    norms = np.sum(embedded ** 2, axis=1)
+    distances = np.maximum(norms[:, None] + norms[None, :] - 2 * embedded @ embedded.T, 0)
+    np.fill_diagonal(distances, 0)
+    k = min(n_bars - 1, max(3, int(2 * np.ceil(np.sqrt(n_bars)))))
+    neighbours = np.argsort(distances, axis=1)[:, 1:k + 1]
+    linked = np.zeros((n_bars, n_bars), dtype=bool)
+    linked[np.arange(n_bars)[:, None], neighbours] = True
+    linked &= linked.T
+    scale = np.median(distances[linked]) if linked.any() else 1.0
+    recurrence = diagonal_smooth(linked * np.exp(-distances / max(scale, 1e-9)), SEGMENT_DIAGONAL_BARS)
+    np.fill_diagonal(recurrence, 0)
     
-    # Convert beat times to sample indices
-    beat_samples = librosa.time_to_samples(beat_times, sr=sr)
+    # Phrase descriptors change little inside a section, so weak succession links mark boundaries
+    steps = np.sum(np.diff(embedded, axis=0) ** 2, axis=1)
+    weights = np.exp(-steps / max(np.median(steps), 1e-9))
+    succession = np.diag(weights, 1) + np.diag(weights, -1)
+    
+    succession_degree, recurrence_degree = succession.sum(axis=1), recurrence.sum(axis=1)
+    total = succession_degree + recurrence_degree
+    mu = succession_degree.dot(total) / max(np.sum(total ** 2), 1e-9)
+    affinity = mu * recurrence + (1 - mu) * succession
+    
+    degree = np.maximum(affinity.sum(axis=1), 1e-9)
+    laplacian = np.eye(n_bars) - affinity / np.sqrt(np.outer(degree, degree))
+    values, vectors = np.linalg.eigh(laplacian)
+    
+    n_labels = int(np.argmax(np.diff(values[:max_labels + 1])[1:])) + 2
+    points = vectors[:, :n_labels] / np.maximum(np.linalg.norm(vectors[:, :n_labels], axis=1, keepdims=True), 1e-9)
+    return kmeans(points, n_labels)
+
+def kmeans(points: np.ndarray, k: int, restarts: int = 10, iterations: int = 50) -> np.ndarray:
+    """Cluster index of each point, best of several deterministic farthest-point initialisations"""
     
-    # Extract features for each beat segment
-    for i, beat_sample in enumerate(beat_samples[:-1]):
-        start_sample = beat_sample
-        end_sample = beat_samples[i + 1] if i + 1 < len(beat_samples) else len(y)
+    best, best_inertia = None, np.inf
+    for first in np.linspace(0, len(points) - 1, min(restarts, len(points))).astype(int):
+        centers = [points[first]]
+        for _ in range(1, k):
+            nearest = np.min(np.sum((points[:, None, :] - np.array(centers)[None]) ** 2, axis=-1), axis=1)
+            centers.append(points[int(np.argmax(nearest))])
+        centers = np.array(centers)
         
-        # Extract segment
-        segment = y[start_sample:end_sample]
+        for _ in range(iterations):
+            distances = np.sum((points[:, None, :] - centers[None]) ** 2, axis=-1)
+            assignment = np.argmin(distances, axis=1)
+            updated = np.array([
+                points[assignment == j].mean(axis=0) if np.any(assignment == j) else centers[j] for j in range(k)
+            ])
+            if np.allclose(updated, centers):
+                break
+            centers = updated
         
-        if len(segment) > 0:
-            # Spectral features
-            energy = float(np.sum(segment ** 2))
-            spectral_centroids = librosa.feature.spectral_centroid(y=segment, sr=sr)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=segment, sr=sr)
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(segment)
-            mfcc = librosa.feature.mfcc(y=segment, sr=sr, n_mfcc=13)
-            
-            features.append(SpectralFeatures(
-                timestamp=beat_times[i],
-                energy=energy,
-                spectral_centroid=float(np.mean(spectral_centroids)),
-                spectral_rolloff=float(np.mean(spectral_rolloff)),
-                zero_crossing_rate=float(np.mean(zero_crossing_rate)),
-                mfcc=np.mean(mfcc, axis=1).tolist()
-            ))
+        inertia = np.sum(np.min(distances, axis=1))
+        if inertia < best_inertia:
+            best, best_inertia = assignment, inertia
+    return best
+
+def label_runs(clusters: np.ndarray, min_bars: int) -> Tuple[List[int], List[str]]:
+    """Section boundaries (start bars plus the end) and letter labels from per-bar clusters.
+
+    Runs shorter than min_bars join the run before them (a short opening run, the one after it);
+    letters follow first appearance.
+    """
+    
+    clusters = clusters.copy()
+    starts = [0] + [i for i in range(1, len(clusters)) if clusters[i] != clusters[i - 1]]
+    ends = starts[1:] + [len(clusters)]
+    for start, end in zip(starts[1:], ends[1:]):
+        if end - start < min_bars:
+            clusters[start:end] = clusters[start - 1]
+    if len(starts) > 1 and ends[0] < min_bars:
+        clusters[:ends[0]] = clusters[ends[0]]
+    
+    boundaries = [0] + [i for i in range(1, len(clusters)) if clusters[i] != clusters[i - 1]] + [len(clusters)]
+    letters: Dict[int, str] = {}
+    labels = []
+    for start in boundaries[:-1]:
+        cluster = int(clusters[start])
+        if cluster not in letters:
+            letters[cluster] = chr(ord('A') + len(letters))
+        labels.append(letters[cluster])
+    return boundaries, labels
+
+def segment_similarity(similarity: np.ndarray, a: Tuple[int, int], b: Tuple[int, int]) -> float:
+    """Mean similarity of two segments' bars, aligned from their starts"""
+    steps = np.arange(min(a[1] - a[0], b[1] - b[0]))
+    return float(np.mean(similarity[a[0] + steps, b[0] + steps]))
+
+def repetition_confidences(similarity: np.ndarray, boundaries: List[int], labels: List[str]) -> List[float]:
+    """How well each section matches the others with its label, or for a one-off, how unlike all others it is"""
     
-    return features
+    segments = list(zip(boundaries[:-1], boundaries[1:]))
+    confidences = []
+    for i, (segment, label) in enumerate(zip(segments, labels)):
+        repeats = [segment_similarity(similarity, segment, other) for j, other in enumerate(segments) if j != i and labels[j] == label]
+        others = [segment_similarity(similarity, segment, other) for j, other in enumerate(segments) if j != i]
+        if repeats:
+            confidence = np.mean(repeats)
+        elif others:
+            confidence = 1 - max(others)
+        else:
+            confidence = 0.5
+        confidences.append(float(np.clip(confidence, 0.0, 1.0)))
+    return confidences
+
+def name_sections(labels: List[str], boundaries: List[int], energy: np.ndarray) -> List[str]:
+    """Section names from repetition: the most repeated (then loudest) label is the chorus,
+    other repeated labels are verses, and one-offs are intro, outro or bridge by position"""
+    
+    counts = {label: labels.count(label) for label in labels}
+    loudness = {
+        label: np.mean([energy[lo:hi].mean() for l, lo, hi in zip(labels, boundaries[:-1], boundaries[1:]) if l == label])
+        for label in counts
+    }
+    repeated = [label for label in counts if counts[label] > 1]
+    chorus = max(repeated, key=lambda label: (counts[label], loudness[label])) if repeated else None
+    
+    names = []
+    for i, label in enumerate(labels):
+        if label == chorus:
+            names.append('chorus')
+        elif counts[label] > 1:
+            names.append('verse')
+        elif i == 0 and len(labels) > 1:
+            names.append('intro')
+        elif i == len(labels) - 1 and len(labels) > 1:
+            names.append('outro')
+        else:
+            names.append('bridge' if repeated else 'verse')
+    return names
+
+def extract_spectral_features(y: np.ndarray, sr: int, beat_times: List[float], cache: Optional[AudioFeatureCache] = None) -> List[SpectralFeatures]:
+    """Extract spectral features aligned to beats"""
+    
+    cache = cache or AudioFeatureCache(y, sr)
+    
+    if len(beat_times) < 2:
+        return []
+    
+    # Map each inter-beat segment onto a [start, end) range of frames
+    beat_frames = np.clip(cache.time_to_frames(beat_times), 0, cache.n_frames - 1)
+    starts = beat_frames[:-1]
+    ends = np.maximum(beat_frames[1:], starts + 1)
+    
+    # Frame-level descriptors computed once for the whole signal
+    frame_features = np.vstack([
+        cache.spectral_centroid,
+        cache.spectral_rolloff,
+        cache.zero_crossing_rate,
+        cache.mfcc
+    ])
+    
+    # Segment means and energy sums from cumulative sums over frames
+    cumulative = np.pad(np.cumsum(frame_features, axis=1), ((0, 0), (1, 0)))
+    means = (cumulative[:, ends] - cumulative[:, starts]) / (ends - starts)
+    cumulative_energy = np.pad(np.cumsum(cache.frame_energy), (1, 0))
+    energies = cumulative_energy[ends] - cumulative_energy[starts]
+    
+    return [
+        SpectralFeatures(
+            timestamp=float(beat_times[i]),
+            energy=float(energies[i]),
+            spectral_centroid=float(means[0, i]),
+            spectral_rolloff=float(means[1, i]),
+            zero_crossing_rate=float(means[2, i]),
+            mfcc=means[3:, i].tolist()
+        )
+        for i in range(len(starts))
+    ]
 
 def create_bar_structure(beat_times: np.ndarray, downbeat_times: np.ndarray, beats_per_bar: int) -> List[Bar]:
     """Create bar structure from beat and downbeat information"""
@@ -201,13 +477,11 @@ def create_bar_structure(beat_times: np.ndarray, downbeat_times: np.ndarray, bea
                     downbeat_timestamp=float(start_time)
                 ))
     else:
-        # Use detected downbeats
-        for i, downbeat_time in enumerate(downbeat_times[:-1]):
-            next_downbeat = downbeat_times[i + 1]
-            
-            # Count beats in this bar
-            beats_in_bar = np.sum((beat_times >= downbeat_time) & (beat_times < next_downbeat))
-            
+        # Use detected downbeats; beats per bar from one binary search over all downbeats
+        bar_index = IntervalIndex(downbeat_times[:-1], downbeat_times[1:])
+        lo, hi = bar_index.point_ranges(beat_times)
+        
+        for downbeat_time, next_downbeat, beats_in_bar in zip(downbeat_times[:-1], downbeat_times[1:], hi - lo):
             bars.append(Bar(
                 start=float(downbeat_time),
                 end=float(next_downbeat),
@@ -0,0 +1,77 @@
+import subprocess
+import tempfile
+import numpy as np
+import soundfile as sf
+from typing import Iterator
+
+MASTER_SAMPLE_RATE = 44100
+
+def _ffmpeg_pcm_command(input_path: str, sr: int) -> list:
+    """ffmpeg command that writes mono float32 PCM at the given rate to stdout"""
+    return [
+        'ffmpeg', '-v', 'error',
+        '-i', input_path,
+        '-ac', '1',        # Mono
+        '-ar', str(sr),    # Sample rate
+        '-f', 'f32le',     # Raw little-endian float32
+        'pipe:1'
+    ]
+
+def decode_to_array(input_path: str, sr: int = MASTER_SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable file straight into a mono float32 array"""
+
+    result = subprocess.run(_ffmpeg_pcm_command(input_path, sr), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg decoding failed: {result.stderr.decode(errors='replace')}")
+
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def iter_decoded_blocks(input_path: str, sr: int, blocksize: int = 262144) -> Iterator[np.ndarray]:
+    """Decode a file incrementally, yielding mono float32 blocks as ffmpeg produces them"""
+
+    process = subprocess.Popen(
+        _ffmpeg_pcm_command(input_path, sr),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    block_bytes = blocksize * 4
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            # Reads are full blocks until EOF, and ffmpeg only emits whole samples
+            yield np.frombuffer(data, dtype=np.float32)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"FFmpeg decoding failed: {stderr.decode(errors='replace')}")
+
+def probe_duration(input_path: str) -> float:
+    """Container duration in seconds according to ffprobe"""
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe failed: {result.stderr}")
+
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+def write_wav_file(y: np.ndarray, sr: int) -> str:
+    """Encode a decoded buffer as 16-bit PCM WAV in a new temporary file and return its path"""
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        path = temp_file.name
+    sf.write(path, y, sr, format='WAV', subtype='PCM_16')
+    return path
@@ -0,0 +1,130 @@
+import aubio
+import librosa
+import madmom
+import numpy as np
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from utils.feature_cache import AudioFeatureCache
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+def librosa_beat_track(cache) -> Tuple[float, np.ndarray]:
+    """Tempo and beat times from librosa's tracker over a cached onset envelope"""
+    tempo, beat_times = librosa.beat.beat_track(
+        onset_envelope=cache.onset_envelope, sr=cache.sr,
+        hop_length=cache.hop_length, units='time'
+    )
+    return float(np.atleast_1d(tempo)[0]), np.asarray(beat_times)
+
+def track_beats_from_onsets(cache) -> Dict[str, Any]:
+    """Beat tracking without the signal, e.g. on streamed per-frame summaries"""
+    tempo, beat_times = librosa_beat_track(cache)
+    return {
+        'bpm': tempo,
+        'tempo_confidence': 0.5,
+        'beat_times': beat_times,
+        'downbeat_times': np.array([]),
+        'beat_positions': np.array([]),
+        'path': BeatEngine.PATH_LIBROSA
+    }
+
+def track_beats_aubio(y: np.ndarray, sr: int, win_size: int = 1024, hop_size: int = 512) -> Dict[str, Any]:
+    """Cheap online beat tracking with aubio, used by the fast analysis profile"""
+
+    tracker = aubio.tempo("default", win_size, hop_size, sr)
+    samples = np.ascontiguousarray(y, dtype=np.float32)
+    n_hops = len(samples) // hop_size
+
+    beat_times = []
+    for frame in samples[:n_hops * hop_size].reshape(n_hops, hop_size):
+        if tracker(frame)[0]:
+            beat_times.append(tracker.get_last_s())
+    beat_times = np.asarray(beat_times)
+
+    if len(beat_times) > 1:
+        intervals = np.diff(beat_times)
+        tempo = 60.0 / np.median(intervals)
+        tempo_confidence = float(tracker.get_confidence())
+    else:
+        tempo = tracker.get_bpm()
+        tempo_confidence = 0.3
+
+    return {
+        'bpm': float(tempo),
+        'tempo_confidence': float(np.clip(tempo_confidence, 0.0, 1.0)),
+        'beat_times': beat_times,
+        'downbeat_times': np.array([]),
+        'beat_positions': np.array([]),
+        'path': BeatEngine.PATH_AUBIO
+    }
+
+class BeatEngine:
+    """Beat and downbeat tracker built on a single madmom RNN pass"""
+
+    PATH_MADMOM = "madmom"
+    PATH_LIBROSA = "librosa"
+    PATH_AUBIO = "aubio"
+
+    def __init__(self, beats_per_bar: int = 4, fps: int = 100):
+        self.fps = fps
+        self.activation_processor = madmom.features.downbeats.RNNDownBeatProcessor()
+        self.beat_processor = madmom.features.beats.DBNBeatTrackingProcessor(fps=fps)
+        self.downbeat_processor = madmom.features.downbeats.DBNDownBeatTrackingProcessor(
+            beats_per_bar=[beats_per_bar], fps=fps
+        )
+
+    def activations(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """Run the downbeat RNN once; columns are (beat, downbeat) probabilities"""
+        signal = madmom.audio.signal.Signal(y, sample_rate=sr, num_channels=1)
+        return self.activation_processor(signal)
+
+    def track(self, y: np.ndarray, sr: int, cache: Optional[AudioFeatureCache] = None,
+              activations: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Track beats and downbeats, falling back to librosa only when madmom finds no tempo"""
+
+        if activations is None:
+            activations = self.activations(y, sr)
+
+        # Any beat (downbeat or not) is the sum of both activation columns
+        beat_activation = np.sum(activations, axis=1)
+        beat_times = np.asarray(self.beat_processor(beat_activation))
+
+        downbeats = self.downbeat_processor(activations)
+        downbeat_times = downbeats[:, 0] if len(downbeats) > 0 else np.array([])
+        beat_positions = downbeats[:, 1] if len(downbeats) > 0 else np.array([])
+
+        path = self.PATH_MADMOM
+        if len(beat_times) > 1:
+            intervals = np.diff(beat_times)
+            tempo = 60.0 / np.median(intervals)
+            tempo_confidence = 1.0 - np.std(intervals) / np.mean(intervals)
+        else:
+            # Not enough madmom beats for a tempo, so run the librosa tracker
+            tempo, beats_librosa = librosa_beat_track(cache or AudioFeatureCache(y, sr))
+            if len(beat_times) == 0:
+                beat_times = np.asarray(beats_librosa)
+                tempo_confidence = 0.5
+                path = self.PATH_LIBROSA
+            else:
+                tempo_confidence = 0.3
+
+        return {
+            'bpm': float(tempo),
+            'tempo_confidence': float(tempo_confidence),
+            'beat_times': beat_times,
+            'downbeat_times': downbeat_times,
+            'beat_positions': beat_positions,
+            'path': path
+        }
+
+def get_beat_engine() -> BeatEngine:
+    """Process-wide BeatEngine, so the RNN models load once per worker process"""
+
+    global _shared_engine
+    if _shared_engine is None:
+        with _shared_engine_lock:
+            if _shared_engine is None:
+                _shared_engine = BeatEngine()
+    return _shared_engine
@@ -0,0 +1,143 @@
+import os
+import threading
+import librosa
+import numpy as np
+from functools import wraps
+from typing import Dict
+
+# Sample rate each analysis stage runs at; the stored processed audio stays at the master rate.
+# madmom's RNN models are trained on 44.1 kHz input, so the beat stage should stay there.
+STAGE_SAMPLE_RATES = {
+    'beats': int(os.getenv('ANALYSIS_SR_BEATS', '44100')),
+    'key': int(os.getenv('ANALYSIS_SR_KEY', '22050')),
+    'structure': int(os.getenv('ANALYSIS_SR_STRUCTURE', '22050')),
+    'spectral': int(os.getenv('ANALYSIS_SR_SPECTRAL', '22050')),
+}
+
+def memoized_feature(compute):
+    """Thread-safe, per-instance cached property.
+
+    functools.cached_property holds one lock per class on Python < 3.12, which would
+    serialize feature computations of unrelated caches across concurrent stages.
+    """
+    name = compute.__name__
+
+    @wraps(compute)
+    def getter(self):
+        if name not in self._values:
+            with self._lock_for(name):
+                if name not in self._values:
+                    self._values[name] = compute(self)
+        return self._values[name]
+
+    return property(getter)
+
+class AudioFeatureCache:
+    """Lazily computed, memoized spectral representations of a single track"""
+
+    def __init__(self, y: np.ndarray, sr: int, n_fft: int = 2048, hop_length: int = 512):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._values: Dict[str, np.ndarray] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    @memoized_feature
+    def stft_magnitude(self) -> np.ndarray:
+        """Magnitude STFT shared by all STFT-based descriptors"""
+        return np.abs(librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length))
+
+    @memoized_feature
+    def mel_spectrogram(self) -> np.ndarray:
+        """Mel power spectrogram derived from the cached STFT"""
+        return librosa.feature.melspectrogram(S=self.stft_magnitude ** 2, sr=self.sr)
+
+    @memoized_feature
+    def log_mel_spectrogram(self) -> np.ndarray:
+        return librosa.power_to_db(self.mel_spectrogram)
+
+    @memoized_feature
+    def chroma(self) -> np.ndarray:
+        """Constant-Q chromagram (the CQT is computed once per track)"""
+        return librosa.feature.chroma_cqt(y=self.y, sr=self.sr, hop_length=self.hop_length)
+
+    @memoized_feature
+    def mfcc(self) -> np.ndarray:
+        return librosa.feature.mfcc(S=self.log_mel_spectrogram, n_mfcc=13)
+
+    @memoized_feature
+    def spectral_contrast(self) -> np.ndarray:
+        return librosa.feature.spectral_contrast(S=self.stft_magnitude, sr=self.sr)
+
+    @memoized_feature
+    def spectral_centroid(self) -> np.ndarray:
+        return librosa.feature.spectral_centroid(S=self.stft_magnitude, sr=self.sr)[0]
+
+    @memoized_feature
+    def spectral_rolloff(self) -> np.ndarray:
+        return librosa.feature.spectral_rolloff(S=self.stft_magnitude, sr=self.sr)[0]
+
+    @memoized_feature
+    def zero_crossing_rate(self) -> np.ndarray:
+        return librosa.feature.zero_crossing_rate(
+            self.y, frame_length=self.n_fft, hop_length=self.hop_length
+        )[0]
+
+    @memoized_feature
+    def frame_energy(self) -> np.ndarray:
+        """Signal energy of each hop-sized block, aligned with the frame grid"""
+        padded = np.zeros(self.n_frames * self.hop_length, dtype=self.y.dtype)
+        padded[:len(self.y)] = self.y
+        return np.sum(padded.reshape(self.n_frames, self.hop_length) ** 2, axis=1, dtype=np.float64)
+
+    @memoized_feature
+    def onset_envelope(self) -> np.ndarray:
+        return librosa.onset.onset_strength(S=self.log_mel_spectrogram, sr=self.sr)
+
+    @property
+    def n_frames(self) -> int:
+        return 1 + len(self.y) // self.hop_length
+
+    def time_to_frames(self, times) -> np.ndarray:
+        """Convert times in seconds to frame indices of the cached representations"""
+        return librosa.time_to_frames(times, sr=self.sr, hop_length=self.hop_length)
+
+
+class AnalysisBuffers:
+    """Master-rate signal with one resampled copy and feature cache per distinct analysis rate"""
+
+    def __init__(self, y: np.ndarray, sr: int):
+        self.y = y
+        self.sr = sr
+        self._signals: Dict[int, np.ndarray] = {sr: y}
+        self._caches: Dict[int, AudioFeatureCache] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self) -> float:
+        return len(self.y) / self.sr
+
+    def signal(self, rate: int) -> np.ndarray:
+        """Return the signal at the given rate, resampling at most once per rate"""
+        if rate not in self._signals:
+            with self._lock:
+                if rate not in self._signals:
+                    self._signals[rate] = librosa.resample(self.y, orig_sr=self.sr, target_sr=rate)
+        return self._signals[rate]
+
+    def features(self, rate: int) -> AudioFeatureCache:
+        if rate not in self._caches:
+            signal = self.signal(rate)
+            with self._lock:
+                self._caches.setdefault(rate, AudioFeatureCache(signal, rate))
+        return self._caches[rate]
+
+    def for_stage(self, stage: str) -> AudioFeatureCache:
+        """Feature cache at the configured rate for an analysis stage"""
+        return self.features(STAGE_SAMPLE_RATES.get(stage, self.sr))
@@ -0,0 +1,187 @@
+import hashlib
+import io
+import os
+import threading
+import numpy as np
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.interval_index import IntervalIndex
+from utils.storage import upload_file_to_s3, download_from_s3, object_exists
+
+# Per-beat arrays stored as compressed columns in object storage instead of JSON rows,
+# with the dtype of each column (timestamps need float32, bounded values fit float16)
+ARRAY_FIELDS = {
+    'beats': {'timestamp': np.float32, 'confidence': np.float16},
+    'downbeats': {'timestamp': np.float32, 'confidence': np.float16},
+    'spectral_features': {
+        'timestamp': np.float32,
+        'energy': np.float32,
+        'spectral_centroid': np.float32,
+        'spectral_rolloff': np.float32,
+        'zero_crossing_rate': np.float16,
+        'mfcc': np.float16,
+    },
+}
+
+ARRAY_FORMAT = "npz"
+
+# Fields a time window applies to, with the time key of their rows
+WINDOWED_FIELDS = {
+    'beats': 'timestamp',
+    'downbeats': 'timestamp',
+    'spectral_features': 'timestamp',
+    'bars': 'start',
+    'sections': 'start',
+    'harmony': 'start',
+}
+
+# Decoded blobs kept per process; blobs are content-addressed, so entries never go stale
+FEATURE_BLOB_CACHE_SIZE = int(os.getenv('FEATURE_BLOB_CACHE_SIZE', '32'))
+
+def pack_feature_arrays(features: Dict[str, Any]) -> bytes:
+    """Compressed npz of the inline array fields of a features dict"""
+
+    columns = {}
+    for field in (name for name in ARRAY_FIELDS if name in features):
+        rows = features[field]
+        for column, dtype in ARRAY_FIELDS[field].items():
+            columns[f"{field}.{column}"] = np.asarray([row[column] for row in rows], dtype=dtype)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    return buffer.getvalue()
+
+def rows_from_columns(arrays: Mapping, field: str, lo: int = 0, hi: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Rebuild JSON rows [lo, hi) of an array field from its columns"""
+
+    columns = {
+        column: arrays[f"{field}.{column}"][lo:hi].astype(np.float64).tolist()
+        for column in ARRAY_FIELDS[field]
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+class FeatureBlob(Mapping):
+    """Columns of a stored npz blob, each decompressed on first use (treat as read-only)"""
+
+    def __init__(self, blob: bytes):
+        self._npz = np.load(io.BytesIO(blob))
+        self._columns: Dict[str, np.ndarray] = {}
+        # The open archive is shared by every request reading the cached blob
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        with self._lock:
+            if name not in self._columns:
+                self._columns[name] = self._npz[name]
+            return self._columns[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._npz.files)
+
+    def __len__(self) -> int:
+        return len(self._npz.files)
+
+def offload_feature_arrays(features: Dict[str, Any]) -> Dict[str, Any]:
+    """Move non-empty array fields to object storage, leaving scalars and a pointer per field.
+
+    Each field is its own blob, so reading one field never downloads another. Already
+    offloaded fields are left alone, so this is safe to apply more than once.
+    """
+
+    fields = [field for field in ARRAY_FIELDS if features.get(field)]
+    if not fields:
+        return features
+
+    pointers = {}
+    for field in fields:
+        blob = pack_feature_arrays({field: features[field]})
+        key = f"features/{hashlib.sha256(blob).hexdigest()}.{ARRAY_FORMAT}"
+        if not object_exists(key):
+            upload_file_to_s3(blob, key, "application/octet-stream")
+        pointers[field] = {'key': key, 'format': ARRAY_FORMAT, 'count': len(features[field])}
+
+    compact = {name: value for name, value in features.items() if name not in fields}
+    compact['arrays'] = {**features.get('arrays', {}), **pointers}
+    return compact
+
+def merge_features(stored: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge newly published fields into stored features, keeping both sets of array pointers"""
+
+    merged = {**stored, **update}
+    # A field published inline replaces an older pointer to the same field
+    arrays = {
+        field: pointer for field, pointer in {**stored.get('arrays', {}), **update.get('arrays', {})}.items()
+        if field not in update or field in update.get('arrays', {})
+    }
+    merged.pop('arrays', None)
+    if arrays:
+        merged['arrays'] = arrays
+    return merged
+
+def load_features(stored: Dict[str, Any], fields: Optional[Iterable[str]] = None,
+                  start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+    """Full features dict (as AudioFeatures.dict()) from a stored, possibly compact, one.
+
+    `fields` projects top-level fields; `start`/`end` keep only the rows of time-indexed
+    fields within the window and add a `window` entry with each sliced field's first index.
+    Offloaded arrays are only fetched, and only converted to rows, for the selected range.
+    """
+
+    if not stored:
+        return stored
+
+    selected = None if fields is None else set(fields)
+    features = {
+        name: value for name, value in stored.items()
+        if name != 'arrays' and (selected is None or name in selected)
+    }
+    windowed = start is not None or end is not None
+    start = -np.inf if start is None else start
+    end = np.inf if end is None else end
+    offsets = {}
+
+    # Offloaded arrays, sliced on their timestamp column before any rows are built
+    for field, pointer in stored.get('arrays', {}).items():
+        if selected is not None and field not in selected:
+            continue
+        arrays = fetch_feature_arrays(pointer['key'])
+        lo, hi = 0, None
+        if windowed:
+            lo, hi = point_window(arrays[f"{field}.timestamp"], start, end)
+            offsets[field] = lo
+        features[field] = rows_from_columns(arrays, field, lo, hi)
+
+    # Inline rows (older records, bars and sections)
+    if windowed:
+        for field, time_key in WINDOWED_FIELDS.items():
+            if field in features and field not in offsets and isinstance(features[field], list):
+                features[field], offsets[field] = slice_rows(features[field], time_key, start, end)
+        features['window'] = {
+            'start': None if np.isinf(start) else start,
+            'end': None if np.isinf(end) else end,
+            'offsets': offsets
+        }
+
+    return features
+
+def point_window(times: Sequence[float], start: float, end: float) -> Tuple[int, int]:
+    """Index range of sorted times within [start, end)"""
+    times = np.asarray(times, dtype=np.float64)
+    return int(np.searchsorted(times, start, side='left')), int(np.searchsorted(times, end, side='left'))
+
+def slice_rows(rows: List[Dict[str, Any]], time_key: str, start: float, end: float) -> Tuple[List[Dict[str, Any]], int]:
+    """Rows inside [start, end): events by their time, intervals (with an 'end') by overlap"""
+
+    if rows and 'end' in rows[0]:
+        index = IntervalIndex([row['start'] for row in rows], [row['end'] for row in rows])
+        window = index.overlapping(start, end)
+        return rows[window.start:window.stop], window.start
+    lo, hi = point_window([row[time_key] for row in rows], start, end)
+    return rows[lo:hi], lo
+
+@lru_cache(maxsize=FEATURE_BLOB_CACHE_SIZE)
+def fetch_feature_arrays(key: str) -> FeatureBlob:
+    """Lazily decoded columns of a stored blob; older records share one blob between fields"""
+    return FeatureBlob(download_from_s3(key))
@@ -0,0 +1,93 @@
+import numpy as np
+from typing import Any, Dict, List, Sequence, Tuple
+
+class IntervalIndex:
+    """Sorted, non-overlapping [start, end) intervals with binary-search lookups"""
+
+    def __init__(self, starts: Sequence[float], ends: Sequence[float]):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def locate(self, times) -> np.ndarray:
+        """Index of the interval containing each time, or -1 outside all intervals"""
+
+        times = np.asarray(times, dtype=np.float64)
+        idx = np.searchsorted(self.starts, times, side='right') - 1
+        if len(self.starts) == 0:
+            return np.full(times.shape, -1)
+        inside = (idx >= 0) & (times < self.ends[np.clip(idx, 0, None)])
+        return np.where(inside, idx, -1)
+
+    def point_ranges(self, points: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """For sorted points, the [lo, hi) index range of points falling in each interval"""
+
+        points = np.asarray(points, dtype=np.float64)
+        return (
+            np.searchsorted(points, self.starts, side='left'),
+            np.searchsorted(points, self.ends, side='left')
+        )
+
+    def contained_in(self, start: float, end: float) -> range:
+        """Intervals lying entirely within [start, end]"""
+
+        lo = int(np.searchsorted(self.starts, start, side='left'))
+        hi = int(np.searchsorted(self.ends, end, side='right'))
+        return range(lo, max(lo, hi))
+
+    def overlapping(self, start: float, end: float) -> range:
+        """Intervals overlapping [start, end)"""
+
+        lo = int(np.searchsorted(self.ends, start, side='right'))
+        hi = int(np.searchsorted(self.starts, end, side='left'))
+        return range(lo, max(lo, hi))
+
+class TimelineIndex:
+    """Beat, bar and section lookups over one track's analysis"""
+
+    def __init__(self, beat_times: Sequence[float], bars: IntervalIndex, sections: IntervalIndex):
+        self.beat_times = np.asarray(beat_times, dtype=np.float64)
+        self.bars = bars
+        self.sections = sections
+
+    @classmethod
+    def from_features(cls, features: Dict[str, Any]) -> "TimelineIndex":
+        """Build the index from an AudioFeatures dict (as stored on the job)"""
+
+        bars = features.get('bars', [])
+        sections = features.get('sections', [])
+        return cls(
+            [beat.get('timestamp', 0.0) for beat in features.get('beats', [])],
+            IntervalIndex([bar.get('start', 0.0) for bar in bars], [bar.get('end', 0.0) for bar in bars]),
+            IntervalIndex([s.get('start', 0.0) for s in sections], [s.get('end', 0.0) for s in sections])
+        )
+
+    def bar_at(self, times) -> np.ndarray:
+        return self.bars.locate(times)
+
+    def section_at(self, times) -> np.ndarray:
+        return self.sections.locate(times)
+
+    def beat_at(self, times) -> np.ndarray:
+        """Index of the last beat at or before each time (-1 before the first beat)"""
+        return np.searchsorted(self.beat_times, np.asarray(times, dtype=np.float64), side='right') - 1
+
+    def position(self, time: float) -> Dict[str, int]:
+        """Bar, beat and beat-within-bar position of a timestamp"""
+
+        bar = int(self.bar_at(time))
+        beat = int(self.beat_at(time))
+        beat_in_bar = -1
+        if bar >= 0 and beat >= 0:
+            first_beat = int(np.searchsorted(self.beat_times, self.bars.starts[bar], side='left'))
+            beat_in_bar = beat - first_beat
+        return {'bar': bar, 'beat': beat, 'beat_in_bar': beat_in_bar}
+
+    def bars_per_section(self) -> List[List[int]]:
+        """Bars lying entirely within each section"""
+        return [
+            list(self.bars.contained_in(start, end))
+            for start, end in zip(self.sections.starts, self.sections.ends)
+        ]
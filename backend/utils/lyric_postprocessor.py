@@ -4,6 +4,7 @@ import logging
 
 from utils.syllable_counter import SyllableCounter
 from utils.rhyme_detector import RhymeDetector
+from utils.interval_index import TimelineIndex
 
 logger = logging.getLogger(__name__)
 
@@ -104,23 +105,27 @@ class LyricPostProcessor:
     def _assign_timestamps(self, lyrics: Dict[str, Any], audio_features: Dict[str, Any]):
         """Assign timestamps to lines based on bar timing"""
         
-        bars = audio_features.get('bars', [])
+        timeline = TimelineIndex.from_features(audio_features)
+        bars = timeline.bars
         
         for section in lyrics.get('sections', []):
-            section_bars = section.get('bars', [])
             lines = section.get('lines', [])
             
             for line in lines:
-                suggested_bar = line.get('suggested_bar_start', 0)
+                suggested_bar = line.get('suggested_bar_start')
+                if suggested_bar is None and 'timestamp_start' in line:
+                    # Lines timed by the model are mapped back onto the bar grid
+                    suggested_bar = int(timeline.bar_at(line['timestamp_start']))
+                if suggested_bar is None:
+                    suggested_bar = 0
                 
                 # Find the corresponding bar timing
-                if suggested_bar < len(bars):
-                    bar = bars[suggested_bar]
-                    line['timestamp_start'] = bar.get('start', 0)
+                if 0 <= suggested_bar < len(bars):
+                    line['timestamp_start'] = float(bars.starts[suggested_bar])
                     
                     # Estimate end time (assume line takes half a bar)
-                    bar_duration = bar.get('end', 2) - bar.get('start', 0)
-                    line['timestamp_end'] = line['timestamp_start'] + (bar_duration / 2)
+                    bar_duration = bars.ends[suggested_bar] - bars.starts[suggested_bar]
+                    line['timestamp_end'] = line['timestamp_start'] + float(bar_duration / 2)
     
     def _fix_syllable_counts(self, lyrics: Dict[str, Any]):
         """Final pass to fix any remaining syllable count issues"""
@@ -0,0 +1,62 @@
+import os
+import logging
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Local cache of decoded master-rate PCM, keyed by source digest, so reanalysis skips
+# the download and decode. Opt-in per worker: enable it where reanalysis runs
+PCM_CACHE_DIR = os.getenv('PCM_CACHE_DIR')
+PCM_CACHE_MAX_BYTES = int(os.getenv('PCM_CACHE_MAX_BYTES', str(4 * 1024 ** 3)))
+
+def pcm_path(digest: str) -> str:
+    return os.path.join(PCM_CACHE_DIR, f"{digest}.npy")
+
+def load_pcm(digest: Optional[str]) -> Optional[np.ndarray]:
+    """Cached PCM of a digest, memory-mapped read-only, or None"""
+
+    if not PCM_CACHE_DIR or not digest:
+        return None
+    path = pcm_path(digest)
+    try:
+        y = np.load(path, mmap_mode='r')
+        # The modification time doubles as the last use for eviction
+        os.utime(path)
+        return y
+    except (OSError, ValueError):
+        return None
+
+def store_pcm(digest: Optional[str], y: np.ndarray):
+    """Cache the PCM of a digest, evicting least recently used entries over the size limit; best effort"""
+
+    if not PCM_CACHE_DIR or not digest or y.nbytes > PCM_CACHE_MAX_BYTES:
+        return
+    try:
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        path = pcm_path(digest)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(y, dtype=np.float32))
+        os.replace(temp_path, path)
+        evict_pcm(PCM_CACHE_MAX_BYTES)
+    except OSError as e:
+        logger.warning(f"Could not cache PCM for {digest}: {e}")
+
+def evict_pcm(max_bytes: int):
+    """Delete the least recently used entries until the cache fits in max_bytes"""
+
+    entries = []
+    for entry in os.scandir(PCM_CACHE_DIR):
+        if entry.name.endswith('.npy'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,55 @@
+import os
+import posixpath
+import subprocess
+from typing import Any, Dict, List, Optional
+
+# Lossless codec the processed audio is archived in (analysis re-reads it) and the
+# lossy rendition the editor streams; PLAYBACK_CODEC=none skips the playback copy
+ARCHIVAL_CODEC = os.getenv('PROCESSED_AUDIO_CODEC', 'flac')
+PLAYBACK_CODEC = os.getenv('PLAYBACK_CODEC', 'opus')
+PLAYBACK_BITRATE = os.getenv('PLAYBACK_BITRATE', '96k')
+
+# File extension, content type and ffmpeg encoder arguments per codec
+CODECS = {
+    'wav': {'ext': 'wav', 'content_type': 'audio/wav', 'args': ['-c:a', 'pcm_s16le']},
+    'flac': {'ext': 'flac', 'content_type': 'audio/flac', 'args': ['-c:a', 'flac', '-compression_level', '5']},
+    'opus': {'ext': 'opus', 'content_type': 'audio/ogg', 'args': ['-c:a', 'libopus', '-b:a', PLAYBACK_BITRATE]},
+    'aac': {'ext': 'm4a', 'content_type': 'audio/mp4', 'args': ['-c:a', 'aac', '-b:a', PLAYBACK_BITRATE, '-movflags', '+faststart']},
+}
+
+def configured_renditions() -> Dict[str, str]:
+    """Rendition name -> codec for newly processed audio"""
+
+    renditions = {'archival': ARCHIVAL_CODEC}
+    if PLAYBACK_CODEC and PLAYBACK_CODEC != 'none':
+        renditions['playback'] = PLAYBACK_CODEC
+    for codec in renditions.values():
+        if codec not in CODECS:
+            raise ValueError(f"Unknown audio codec '{codec}'")
+    return renditions
+
+def rendition_key(job_id: str, name: str, codec: str) -> str:
+    """Archival audio keeps the audio.* name; other renditions are named after themselves"""
+    stem = 'audio' if name == 'archival' else name
+    return f"processed/{job_id}/{stem}.{CODECS[codec]['ext']}"
+
+def encode_rendition(wav_path: str, codec: str) -> str:
+    """Encode a processed WAV with the given codec next to it and return the new path"""
+
+    if codec == 'wav':
+        return wav_path
+    output_path = f"{os.path.splitext(wav_path)[0]}.rendition.{CODECS[codec]['ext']}"
+    cmd: List[str] = ['ffmpeg', '-v', 'error', '-i', wav_path, *CODECS[codec]['args'], '-y', output_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg {codec} encoding failed: {result.stderr}")
+    return output_path
+
+def legacy_renditions(processed_url: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Renditions of audio processed before renditions were tracked: the archival file alone"""
+
+    if not processed_url:
+        return None
+    ext = posixpath.splitext(processed_url)[1].lstrip('.')
+    codec = next((name for name, spec in CODECS.items() if spec['ext'] == ext), 'wav')
+    return {'archival': {'url': processed_url, 'codec': codec, 'content_type': CODECS[codec]['content_type']}}
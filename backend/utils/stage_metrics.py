@@ -0,0 +1,125 @@
+import os
+import resource
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CollectorRegistry, Histogram, multiprocess, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# Port the audio worker serves /metrics on (disabled when unset)
+METRICS_PORT = os.getenv('AUDIO_METRICS_PORT')
+
+# rendition is empty except for the per-rendition upload stage
+STAGE_LABELS = ['stage', 'profile', 'duration_bucket', 'rendition']
+
+STAGE_WALL_SECONDS = Histogram(
+    'audio_stage_wall_seconds', 'Wall time of audio pipeline stages', STAGE_LABELS,
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+STAGE_CPU_SECONDS = Histogram(
+    'audio_stage_cpu_seconds', 'CPU time of audio pipeline stages (stage thread plus child processes)', STAGE_LABELS,
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+STAGE_PEAK_RSS_DELTA_BYTES = Histogram(
+    'audio_stage_peak_rss_delta_bytes', 'Growth of the worker peak RSS during audio pipeline stages', STAGE_LABELS,
+    buckets=tuple(mb * 2 ** 20 for mb in (1, 8, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+)
+
+# Track length buckets (upper bound in seconds, label) for the duration_bucket label
+DURATION_BUCKETS = [(60, 'under_1m'), (300, '1m_5m'), (900, '5m_15m'), (float('inf'), 'over_15m')]
+
+def duration_bucket(duration: Optional[float]) -> str:
+    if duration is None:
+        return 'unknown'
+    return next(label for bound, label in DURATION_BUCKETS if duration < bound)
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far (ru_maxrss is in KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def children_cpu_seconds() -> float:
+    """CPU time of waited-for child processes, e.g. ffmpeg"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class StageTimer:
+    """Wall time, CPU time and peak RSS growth of the named stages of one job"""
+
+    def __init__(self, profile: str):
+        self.profile = profile
+        self.duration: Optional[float] = None
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rendition: Optional[str] = None):
+        # thread_time keeps concurrently running analysis stages from counting each other's CPU
+        rss_before = peak_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time() + children_cpu_seconds()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'rendition': rendition or '',
+                'wall_time': time.perf_counter() - wall_start,
+                'cpu_time': time.thread_time() + children_cpu_seconds() - cpu_start,
+                'peak_rss_delta': peak_rss_bytes() - rss_before,
+            }
+            with self._lock:
+                # Stages repeated per rendition are kept apart, e.g. upload:playback
+                self.stages[f"{name}:{rendition}" if rendition else name] = record
+
+    def wrap(self, name: str, func: Callable[..., Any], rendition: Optional[str] = None) -> Callable[..., Any]:
+        """func, timed as stage `name` whenever it is called"""
+
+        def timed(*args, **kwargs):
+            with self.stage(name, rendition):
+                return func(*args, **kwargs)
+        return timed
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'profile': str(getattr(self.profile, 'value', self.profile)),
+                'duration_bucket': duration_bucket(self.duration),
+                'stages': {name: dict(record) for name, record in self.stages.items()},
+            }
+
+    def observe(self):
+        """Export the recorded stages to the metrics histograms"""
+
+        timings = self.as_dict()
+        for name, record in timings['stages'].items():
+            labels = (record.get('stage', name), timings['profile'], timings['duration_bucket'], record.get('rendition', ''))
+            STAGE_WALL_SECONDS.labels(*labels).observe(record['wall_time'])
+            STAGE_CPU_SECONDS.labels(*labels).observe(record['cpu_time'])
+            STAGE_PEAK_RSS_DELTA_BYTES.labels(*labels).observe(record['peak_rss_delta'])
+
+def start_metrics_server():
+    """Serve /metrics from the worker parent, aggregating what the prefork children record.
+
+    Children can only report through PROMETHEUS_MULTIPROC_DIR, so the server refuses to start
+    without it. Files left there by an earlier run are removed first.
+    """
+
+    if not METRICS_PORT:
+        return
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not multiproc_dir:
+        logger.error("AUDIO_METRICS_PORT is set but PROMETHEUS_MULTIPROC_DIR is not; "
+                     "pool processes cannot export stage metrics, not serving /metrics")
+        return
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for entry in os.scandir(multiproc_dir):
+        if entry.name.endswith('.db'):
+            os.unlink(entry.path)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(int(METRICS_PORT), registry=registry)
+    logger.info(f"Serving audio worker metrics on port {METRICS_PORT}")
@@ -0,0 +1,64 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Threads one audio worker may spend on concurrent analysis stages
+ANALYSIS_CPU_BUDGET = int(os.getenv('ANALYSIS_CPU_BUDGET', str(min(4, os.cpu_count() or 1))))
+
+# Stages run at once by default; a worker's thread layout may lower it below the budget
+_stage_workers = ANALYSIS_CPU_BUDGET
+
+def set_stage_workers(count: int):
+    """Default stage concurrency of new schedulers, capped by ANALYSIS_CPU_BUDGET"""
+    global _stage_workers
+    _stage_workers = max(1, min(count, ANALYSIS_CPU_BUDGET))
+
+StageFunc = Callable[[Dict[str, Any]], Any]
+
+class StageScheduler:
+    """Run analysis stages on a bounded thread pool as soon as their dependencies finish"""
+    
+    def __init__(self, max_workers: Optional[int] = None,
+                 on_stage_complete: Optional[Callable[[str, Any], None]] = None):
+        self.max_workers = max(1, max_workers or _stage_workers)
+        self.on_stage_complete = on_stage_complete
+        self._stages: Dict[str, tuple] = {}
+    
+    def add(self, name: str, func: StageFunc, depends_on: Iterable[str] = ()):
+        """Register a stage; func receives the results of the stages completed so far"""
+        self._stages[name] = (func, tuple(depends_on))
+    
+    def run(self) -> Dict[str, Any]:
+        """Execute all stages and return their results keyed by stage name"""
+        
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running = {}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    if all(dep in results for dep in depends_on):
+                        running[pool.submit(func, dict(results))] = name
+                        del pending[name]
+                
+                if not running:
+                    raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        logger.error(f"Analysis stage '{name}' failed")
+                        for other in running:
+                            other.cancel()
+                        raise
+                    if self.on_stage_complete:
+                        self.on_stage_complete(name, results[name])
+        
+        return results
@@ -1,7 +1,12 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import os
-from typing import Optional
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 # Initialize S3 client
 s3_client = boto3.client(
@@ -12,8 +17,34 @@ s3_client = boto3.client(
     region_name='us-east-1'
 )
 
+# Presigned URLs are used by browsers, which may reach storage under another host than
+# the services do (e.g. http://localhost:9000 instead of http://minio:9000 under compose)
+presign_client = boto3.client(
+    's3',
+    endpoint_url=os.getenv('S3_PUBLIC_ENDPOINT') or os.getenv('S3_ENDPOINT'),
+    aws_access_key_id=os.getenv('S3_ACCESS_KEY'),
+    aws_secret_access_key=os.getenv('S3_SECRET_KEY'),
+    region_name='us-east-1',
+    config=Config(signature_version='s3v4')
+)
+
 BUCKET_NAME = os.getenv('S3_BUCKET', 'beatlyrics')
 
+# Lifetime of presigned upload URLs, in seconds
+PRESIGN_EXPIRY = int(os.getenv('S3_PRESIGN_EXPIRY', '3600'))
+
+# Multipart part size (S3 minimum is 5 MB) and parts transferred in parallel per object
+S3_PART_SIZE = int(os.getenv('S3_PART_SIZE', str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '4'))
+
+# Memory per transfer is bounded by part size x concurrency, whatever the object size
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_PART_SIZE,
+    multipart_chunksize=S3_PART_SIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+
 def upload_file_to_s3(file_data: bytes, key: str, content_type: str) -> str:
     """Upload file to S3 and return URL"""
     
@@ -25,13 +56,105 @@ def upload_file_to_s3(file_data: bytes, key: str, content_type: str) -> str:
             ContentType=content_type
         )
         
-        # Generate URL
-        url = f"{os.getenv('S3_ENDPOINT')}/{BUCKET_NAME}/{key}"
-        return url
+        return object_url(key)
+        
+    except ClientError as e:
+        raise RuntimeError(f"S3 upload failed: {str(e)}")
+
+def upload_from_file(path: str, key: str, content_type: str) -> str:
+    """Upload a local file in parallel multipart chunks and return URL"""
+    
+    try:
+        s3_client.upload_file(path, BUCKET_NAME, key, ExtraArgs={'ContentType': content_type}, Config=TRANSFER_CONFIG)
+        return object_url(key)
         
     except ClientError as e:
         raise RuntimeError(f"S3 upload failed: {str(e)}")
 
+class MultipartUpload:
+    """Multipart upload fed one part at a time, e.g. from a request body; parts may upload concurrently.
+
+    Pass the `upload_id` of an upload started earlier to resume it, e.g. to complete
+    parts a client uploaded itself through presigned URLs.
+    """
+    
+    def __init__(self, key: str, content_type: Optional[str] = None, upload_id: Optional[str] = None):
+        self.key = key
+        self._parts: Dict[int, str] = {}
+        if upload_id:
+            self.upload_id = upload_id
+            return
+        try:
+            response = s3_client.create_multipart_upload(Bucket=BUCKET_NAME, Key=key, ContentType=content_type)
+            self.upload_id = response['UploadId']
+        except ClientError as e:
+            raise RuntimeError(f"S3 upload failed: {str(e)}")
+    
+    def presign_part(self, number: int, expires_in: int = PRESIGN_EXPIRY) -> str:
+        """URL a client can PUT part `number` to directly"""
+        
+        return presign_client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': BUCKET_NAME, 'Key': self.key, 'UploadId': self.upload_id, 'PartNumber': number},
+            ExpiresIn=expires_in
+        )
+    
+    def load_parts(self) -> int:
+        """Take the part list from storage (parts uploaded elsewhere) and return the part count"""
+        
+        try:
+            paginator = s3_client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id):
+                for part in page.get('Parts', []):
+                    self._parts[part['PartNumber']] = part['ETag']
+            return len(self._parts)
+        except ClientError as e:
+            raise RuntimeError(f"S3 upload failed: {str(e)}")
+    
+    def upload_part(self, number: int, data: bytes):
+        """Upload part `number` (from 1); all parts but the last must be at least 5 MB"""
+        
+        try:
+            response = s3_client.upload_part(
+                Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+            )
+            self._parts[number] = response['ETag']
+        except ClientError as e:
+            raise RuntimeError(f"S3 upload failed: {str(e)}")
+    
+    def complete(self) -> str:
+        """Assemble the uploaded parts and return the object URL"""
+        
+        try:
+            s3_client.complete_multipart_upload(
+                Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': etag} for number, etag in sorted(self._parts.items())
+                ]}
+            )
+            return object_url(self.key)
+        except ClientError as e:
+            raise RuntimeError(f"S3 upload failed: {str(e)}")
+    
+    def abort(self):
+        """Discard the uploaded parts"""
+        
+        try:
+            s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id)
+        except ClientError as e:
+            logger.warning(f"S3 abort of {self.key} failed: {e}")
+
+def object_url(key: str) -> str:
+    return f"{os.getenv('S3_ENDPOINT')}/{BUCKET_NAME}/{key}"
+
+def key_from_url(url: str) -> str:
+    """Object key of a URL returned by upload_file_to_s3"""
+    
+    prefix = f"{os.getenv('S3_ENDPOINT')}/{BUCKET_NAME}/"
+    if not url.startswith(prefix):
+        raise ValueError(f"Not an object URL in bucket {BUCKET_NAME}: {url}")
+    return url[len(prefix):]
+
 def download_from_s3(key: str) -> bytes:
     """Download file from S3"""
     
@@ -42,6 +165,50 @@ def download_from_s3(key: str) -> bytes:
     except ClientError as e:
         raise RuntimeError(f"S3 download failed: {str(e)}")
 
+def download_to_file(key: str, path: str):
+    """Download an object to a local file with parallel ranged GETs"""
+    
+    try:
+        s3_client.download_file(BUCKET_NAME, key, path, Config=TRANSFER_CONFIG)
+        
+    except ClientError as e:
+        raise RuntimeError(f"S3 download failed: {str(e)}")
+
+def download_range_from_s3(key: str, start: int, end: int) -> bytes:
+    """Download bytes start..end (inclusive) of a stored object"""
+    
+    try:
+        response = s3_client.get_object(Bucket=BUCKET_NAME, Key=key, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+        
+    except ClientError as e:
+        raise RuntimeError(f"S3 download failed: {str(e)}")
+
+def object_exists(key: str) -> bool:
+    """Whether an object is already stored under key"""
+    
+    try:
+        s3_client.head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError:
+        return False
+
+def presign_download(key: str, expires_in: int = PRESIGN_EXPIRY) -> str:
+    """URL a client can GET an object from directly (ranged requests included)"""
+    
+    return presign_client.generate_presigned_url(
+        'get_object', Params={'Bucket': BUCKET_NAME, 'Key': key}, ExpiresIn=expires_in
+    )
+
+def object_info(key: str) -> Optional[Dict[str, Any]]:
+    """Size and content type of a stored object, or None if there is none"""
+    
+    try:
+        response = s3_client.head_object(Bucket=BUCKET_NAME, Key=key)
+        return {'size': response['ContentLength'], 'content_type': response.get('ContentType')}
+    except ClientError:
+        return None
+
 def delete_from_s3(key: str) -> bool:
     """Delete file from S3"""
     
@@ -50,5 +217,5 @@ def delete_from_s3(key: str) -> bool:
         return True
         
     except ClientError as e:
-        print(f"S3 delete failed: {str(e)}")
+        logger.warning(f"S3 delete failed: {e}")
         return False
@@ -0,0 +1,150 @@
+import os
+import librosa
+import numpy as np
+from typing import Dict, Iterable, List
+
+# Tracks at least this long are analyzed block by block instead of decoded in full
+STREAMING_MIN_DURATION = float(os.getenv('STREAMING_MIN_DURATION', '900'))
+STREAMING_ANALYSIS_SR = int(os.getenv('STREAMING_ANALYSIS_SR', '22050'))
+STREAMING_BLOCK_FRAMES = int(os.getenv('STREAMING_BLOCK_FRAMES', '2048'))
+
+def should_stream(duration: float) -> bool:
+    """Whether a track is long enough to need bounded-memory analysis"""
+    return duration >= STREAMING_MIN_DURATION
+
+class StreamingFeatureCache:
+    """Per-frame summaries of a long track, computed block by block with overlap-save.
+
+    Exposes the same frame-level features as AudioFeatureCache on the same centered
+    frame grid, but keeps no signal or spectrogram, so memory only grows with the
+    compact per-frame summaries.
+    """
+
+    def __init__(self, sr: int, n_fft: int = 2048, hop_length: int = 512):
+        self.y = None
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.duration = 0.0
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        self._previous_log_mel = None
+        self._summaries: Dict[str, List[np.ndarray]] = {}
+        self._values: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[np.ndarray], sr: int = STREAMING_ANALYSIS_SR) -> "StreamingFeatureCache":
+        """Summarize mono sample chunks that are already at the analysis rate"""
+        cache = cls(sr)
+        cache.consume(chunks)
+        return cache
+
+    def consume(self, chunks: Iterable[np.ndarray], frames_per_block: int = STREAMING_BLOCK_FRAMES):
+        """Frame a stream of sample chunks into overlapping blocks and summarize each"""
+
+        hop = self.hop_length
+        block_length = frames_per_block * hop + self.n_fft - hop
+        # Leading half-window of silence puts frame i at the center time i * hop, as with center=True
+        carry = np.zeros(self.n_fft // 2, dtype=np.float32)
+        n_samples = 0
+
+        for chunk in chunks:
+            n_samples += len(chunk)
+            carry = np.concatenate([carry, chunk.astype(np.float32, copy=False)])
+            while len(carry) >= block_length:
+                self._summarize(carry[:block_length])
+                carry = carry[frames_per_block * hop:]
+
+        # Trailing half-window and enough padding for the final centered frame
+        n_frames = 1 + n_samples // hop
+        emitted = self.n_frames
+        tail_frames = n_frames - emitted
+        if tail_frames > 0:
+            tail_length = (tail_frames - 1) * hop + self.n_fft
+            tail = np.zeros(max(tail_length, len(carry)), dtype=np.float32)
+            tail[:len(carry)] = carry
+            self._summarize(tail[:tail_length])
+
+        self.duration = n_samples / self.sr
+        self._values = {name: np.concatenate(parts, axis=-1) for name, parts in self._summaries.items()}
+        self._summaries = {}
+
+    def _summarize(self, block: np.ndarray):
+        """Compute per-frame summaries for one block (frames are not centered within the block)"""
+
+        hop = self.hop_length
+        S = np.abs(librosa.stft(block, n_fft=self.n_fft, hop_length=hop, center=False))
+        power = S ** 2
+        log_mel = librosa.power_to_db(self._mel_basis @ power)
+        n_frames = S.shape[1]
+
+        # Spectral flux needs the last frame of the previous block
+        previous = self._previous_log_mel if self._previous_log_mel is not None else log_mel[:, :1]
+        flux = np.diff(np.concatenate([previous, log_mel], axis=1), axis=1)
+        self._previous_log_mel = log_mel[:, -1:]
+
+        # Energy of the hop-sized block that starts at each frame's center
+        offset = self.n_fft // 2
+        hop_blocks = block[offset:offset + n_frames * hop].reshape(n_frames, hop)
+
+        self._append('mfcc', librosa.feature.mfcc(S=log_mel, n_mfcc=13))
+        self._append('chroma', librosa.feature.chroma_stft(S=power, sr=self.sr, n_fft=self.n_fft))
+        self._append('spectral_contrast', librosa.feature.spectral_contrast(S=S, sr=self.sr))
+        self._append('spectral_centroid', librosa.feature.spectral_centroid(S=S, sr=self.sr)[0])
+        self._append('spectral_rolloff', librosa.feature.spectral_rolloff(S=S, sr=self.sr)[0])
+        self._append('zero_crossing_rate', librosa.feature.zero_crossing_rate(
+            block, frame_length=self.n_fft, hop_length=hop, center=False
+        )[0][:n_frames])
+        self._append('frame_energy', np.sum(hop_blocks.astype(np.float64) ** 2, axis=1))
+        self._append('onset_envelope', np.mean(np.maximum(0.0, flux), axis=0))
+
+    def _append(self, name: str, values: np.ndarray):
+        self._summaries.setdefault(name, []).append(values.astype(np.float32, copy=False))
+
+    @property
+    def n_frames(self) -> int:
+        source = self._values or self._summaries
+        if 'onset_envelope' not in source:
+            return 0
+        values = source['onset_envelope']
+        return values.shape[-1] if isinstance(values, np.ndarray) else sum(part.shape[-1] for part in values)
+
+    @property
+    def mfcc(self) -> np.ndarray:
+        return self._values['mfcc']
+
+    @property
+    def chroma(self) -> np.ndarray:
+        """STFT chromagram; a CQT needs the whole signal"""
+        return self._values['chroma']
+
+    @property
+    def spectral_contrast(self) -> np.ndarray:
+        return self._values['spectral_contrast']
+
+    @property
+    def spectral_centroid(self) -> np.ndarray:
+        return self._values['spectral_centroid']
+
+    @property
+    def spectral_rolloff(self) -> np.ndarray:
+        return self._values['spectral_rolloff']
+
+    @property
+    def zero_crossing_rate(self) -> np.ndarray:
+        return self._values['zero_crossing_rate']
+
+    @property
+    def frame_energy(self) -> np.ndarray:
+        return self._values['frame_energy']
+
+    @property
+    def onset_envelope(self) -> np.ndarray:
+        """Mean positive log-mel flux per frame"""
+        return self._values['onset_envelope']
+
+    def time_to_frames(self, times) -> np.ndarray:
+        return librosa.time_to_frames(times, sr=self.sr, hop_length=self.hop_length)
+
+    def for_stage(self, stage: str) -> "StreamingFeatureCache":
+        """Every stage reads the same streamed summaries"""
+        return self
@@ -0,0 +1,70 @@
+import os
+import re
+import subprocess
+import librosa
+import numpy as np
+from typing import Any, Dict, Optional
+
+from utils.audio_analysis import estimate_key
+
+# Inline preview budget: decode only the start of the file at a low rate
+PREVIEW_SECONDS = float(os.getenv('TEMPO_PREVIEW_SECONDS', '30'))
+PREVIEW_SAMPLE_RATE = int(os.getenv('TEMPO_PREVIEW_SR', '11025'))
+PREVIEW_MAX_BYTES = int(os.getenv('TEMPO_PREVIEW_MAX_BYTES', str(8 * 1024 * 1024)))
+PREVIEW_TIMEOUT = float(os.getenv('TEMPO_PREVIEW_TIMEOUT', '1.5'))
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE_RE = re.compile(r"bitrate: (\d+) kb/s")
+
+def probe_tempo(prefix: bytes, total_size: Optional[int] = None) -> Dict[str, Any]:
+    """Provisional BPM, duration and key from the first seconds of an encoded file"""
+    
+    total_size = total_size if total_size is not None else len(prefix)
+    data = prefix[:PREVIEW_MAX_BYTES]
+    
+    cmd = [
+        'ffmpeg', '-hide_banner',
+        '-i', 'pipe:0',
+        '-t', str(PREVIEW_SECONDS),
+        '-ac', '1',
+        '-ar', str(PREVIEW_SAMPLE_RATE),
+        '-f', 'f32le',
+        'pipe:1'
+    ]
+    result = subprocess.run(cmd, input=data, capture_output=True, timeout=PREVIEW_TIMEOUT)
+    y = np.frombuffer(result.stdout, dtype=np.float32)
+    if len(y) < PREVIEW_SAMPLE_RATE:
+        raise RuntimeError("Not enough decodable audio for a tempo preview")
+    
+    # Onset autocorrelation tempo estimate
+    onset_envelope = librosa.onset.onset_strength(y=y, sr=PREVIEW_SAMPLE_RATE)
+    tempo = librosa.feature.tempo(onset_envelope=onset_envelope, sr=PREVIEW_SAMPLE_RATE)
+    
+    key, key_confidence = estimate_key(np.mean(librosa.feature.chroma_stft(y=y, sr=PREVIEW_SAMPLE_RATE), axis=1))
+    
+    return {
+        'bpm': round(float(np.atleast_1d(tempo)[0]), 1),
+        'duration': estimate_duration(result.stderr.decode(errors='replace'), total_size, len(data), len(y)),
+        'key': key,
+        'key_confidence': key_confidence,
+        'provisional': True
+    }
+
+def estimate_duration(ffmpeg_log: str, total_size: int, probed_size: int, decoded_samples: int) -> Optional[float]:
+    """Duration from the container header, else from bitrate and file size"""
+    
+    match = _DURATION_RE.search(ffmpeg_log)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return round(int(hours) * 3600 + int(minutes) * 60 + float(seconds), 2)
+    
+    # The whole file fit in the probe and decoded before the time limit
+    decoded_seconds = decoded_samples / PREVIEW_SAMPLE_RATE
+    if probed_size >= total_size and decoded_seconds < PREVIEW_SECONDS:
+        return round(decoded_seconds, 2)
+    
+    match = _BITRATE_RE.search(ffmpeg_log)
+    if match and int(match.group(1)) > 0:
+        return round(total_size * 8 / (int(match.group(1)) * 1000), 2)
+    
+    return None
@@ -0,0 +1,93 @@
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from utils.stage_scheduler import ANALYSIS_CPU_BUDGET, set_stage_workers
+
+logger = logging.getLogger(__name__)
+
+# BLAS, OpenMP and numba size their thread pools to every core when they load, so each
+# prefork child would start one thread per core. These variables cap the pools at load time
+NATIVE_THREAD_ENV = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'BLIS_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'NUMBA_NUM_THREADS',
+)
+
+# CPUs one worker child may keep busy; by default the worker's CPUs split evenly between children
+WORKER_THREADS_PER_CHILD = int(os.getenv('WORKER_THREADS_PER_CHILD', '0')) or None
+
+def available_cpus() -> int:
+    """CPUs this process may run on: its affinity mask, capped by a cgroup v2 CPU quota"""
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def thread_layout(concurrency: Optional[int] = None, cpus: Optional[int] = None,
+                  threads_per_child: Optional[int] = None, stage_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Split the CPUs between worker children, their analysis stage threads and native thread pools.
+
+    Each child gets `threads_per_child` CPUs (an even share by default), runs at most that many
+    stages at once, and each stage's BLAS/OpenMP/numba calls use the CPUs left per stage, so a
+    fully busy worker keeps about one runnable thread per CPU.
+    """
+
+    cpus = cpus or available_cpus()
+    concurrency = max(1, concurrency or cpus)
+    per_child = max(1, threads_per_child or WORKER_THREADS_PER_CHILD or cpus // concurrency)
+    stages = max(1, min(stage_workers or ANALYSIS_CPU_BUDGET, per_child))
+    return {
+        'cpus': cpus,
+        'concurrency': concurrency,
+        'threads_per_child': per_child,
+        'stage_workers': stages,
+        'native_threads': max(1, per_child // stages),
+    }
+
+def export_thread_env(layout: Dict[str, Any]):
+    """Size the pools of native libraries loaded from now on, here and in child processes, to a layout"""
+
+    for name in NATIVE_THREAD_ENV:
+        os.environ[name] = str(layout['native_threads'])
+
+def apply_thread_layout(layout: Dict[str, Any]) -> Dict[str, Any]:
+    """Resize the pools of already loaded native libraries to a layout; returns what was applied"""
+
+    native = layout['native_threads']
+    set_stage_workers(layout['stage_workers'])
+    applied = {'stage_workers': layout['stage_workers']}
+
+    try:
+        from threadpoolctl import threadpool_info, threadpool_limits
+        # Not used as a context manager, so the limits hold for the life of the process
+        threadpool_limits(limits=native)
+        applied['native_pools'] = [
+            {'api': pool['internal_api'], 'library': os.path.basename(pool['filepath']), 'threads': pool['num_threads']}
+            for pool in threadpool_info()
+        ]
+    except ImportError:
+        logger.warning("threadpoolctl not installed; BLAS/OpenMP pools keep their load-time size")
+
+    try:
+        import numba
+        # Cannot exceed the pool numba started with
+        numba.set_num_threads(min(native, numba.config.NUMBA_NUM_THREADS))
+        applied['numba_threads'] = numba.get_num_threads()
+    except ImportError:
+        pass
+
+    return applied
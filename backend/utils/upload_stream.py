@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import os
+from typing import Callable, Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from utils.storage import MultipartUpload, S3_PART_SIZE, S3_MAX_CONCURRENCY
+
+# Bytes read from the request body per step; memory per upload stays around
+# one part being filled plus S3_MAX_CONCURRENCY parts in flight
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+
+class UploadRejected(ValueError):
+    """Upload refused part way through the body (too large, empty or not audio)"""
+
+class UploadTooLarge(UploadRejected):
+    """Upload body over the size limit"""
+
+class StreamedUpload:
+    """An upload streamed to a pending multipart object; complete() or abort() it"""
+
+    def __init__(self, multipart: MultipartUpload, content_type: str, size: int, digest: str, prefix: bytes):
+        self.multipart = multipart
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+        self.prefix = prefix
+
+    async def complete(self) -> str:
+        return await run_in_threadpool(self.multipart.complete)
+
+    async def abort(self):
+        await run_in_threadpool(self.multipart.abort)
+
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """Content type from the magic bytes at the start of an audio file"""
+
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'audio/wav'
+    if head[:4] == b'fLaC':
+        return 'audio/flac'
+    if head[:4] == b'OggS':
+        return 'audio/ogg'
+    if head[4:8] == b'ftyp':
+        return 'audio/mp4'
+    if head[:3] == b'ID3':
+        return 'audio/mpeg'
+    if len(head) >= 2 and head[0] == 0xFF:
+        # Frame sync: ADTS has layer bits 00, MPEG audio frames do not
+        if head[1] & 0xF6 == 0xF0:
+            return 'audio/aac'
+        if head[1] & 0xE0 == 0xE0:
+            return 'audio/mpeg'
+    return None
+
+async def stream_upload(file: UploadFile, key: str, max_bytes: int, prefix_bytes: int = 0,
+                        on_prefix: Optional[Callable[[bytes], None]] = None) -> StreamedUpload:
+    """Copy an uploaded file to a multipart object in chunks, hashing and checking it on the way.
+
+    The format is sniffed from the first chunk and the size limit enforced as bytes arrive,
+    so a bad upload is rejected before it is all stored. `on_prefix` is called once with the
+    first `prefix_bytes` bytes (or the whole file, if shorter) as soon as they have been read.
+    """
+
+    digest = hashlib.sha256()
+    size = 0
+    prefix = bytearray()
+    part = bytearray()
+    part_number = 0
+    multipart = None
+    content_type = None
+    pending = set()
+
+    def emit_prefix():
+        nonlocal on_prefix
+        if on_prefix:
+            on_prefix(bytes(prefix))
+            on_prefix = None
+
+    async def send_part():
+        nonlocal part, part_number, pending
+        part_number += 1
+        pending.add(asyncio.ensure_future(run_in_threadpool(multipart.upload_part, part_number, bytes(part))))
+        part = bytearray()
+        if len(pending) >= S3_MAX_CONCURRENCY:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge("File too large")
+            if multipart is None:
+                content_type = sniff_audio_format(chunk)
+                if content_type is None:
+                    raise UploadRejected("Unrecognized audio format")
+                multipart = await run_in_threadpool(MultipartUpload, key, content_type)
+
+            digest.update(chunk)
+            if len(prefix) < prefix_bytes:
+                prefix += chunk[:prefix_bytes - len(prefix)]
+                if len(prefix) == prefix_bytes:
+                    emit_prefix()
+            part += chunk
+            if len(part) >= S3_PART_SIZE:
+                await send_part()
+
+        if multipart is None:
+            raise UploadRejected("Empty file")
+        if part:
+            await send_part()
+        emit_prefix()
+        await asyncio.gather(*pending)
+
+    except BaseException:
+        # Let in-flight parts settle before discarding them
+        await asyncio.gather(*pending, return_exceptions=True)
+        if multipart is not None:
+            await run_in_threadpool(multipart.abort)
+        raise
+
+    return StreamedUpload(multipart, content_type, size, digest.hexdigest(), bytes(prefix))
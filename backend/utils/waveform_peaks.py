@@ -0,0 +1,135 @@
+import os
+import posixpath
+import struct
+import numpy as np
+import soundfile as sf
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from utils.storage import download_range_from_s3
+
+# Finest zoom level: one min/max pair per this many samples; each further level halves the resolution
+PEAK_BASE_SAMPLES = int(os.getenv('WAVEFORM_BASE_SAMPLES_PER_PEAK', '256'))
+PEAK_LEVELS = int(os.getenv('WAVEFORM_LEVELS', '10'))
+
+# Layout (little-endian): header, one table entry per level, then per level the
+# interleaved int8 (min, max) pairs, so any peak range is one contiguous byte range
+MAGIC = b'BLWP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIQ')   # magic, version, level count, sample rate, sample count
+LEVEL = struct.Struct('<IIQ')       # samples per peak, peak count, data offset
+MAX_HEADER_BYTES = HEADER.size + LEVEL.size * 32
+
+class PeakPyramidBuilder:
+    """Min/max peak pyramid of a mono signal, fed in blocks of any size"""
+
+    def __init__(self, sr: int, base_samples: int = PEAK_BASE_SAMPLES, levels: int = PEAK_LEVELS):
+        self.sr = sr
+        self.base_samples = base_samples
+        self.levels = levels
+        self.n_samples = 0
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._mins = []
+        self._maxs = []
+
+    def add(self, samples: np.ndarray):
+        self.n_samples += len(samples)
+        samples = np.concatenate([self._carry, np.asarray(samples, dtype=np.float32)])
+        whole = len(samples) // self.base_samples * self.base_samples
+        blocks = samples[:whole].reshape(-1, self.base_samples)
+        self._mins.append(blocks.min(axis=1))
+        self._maxs.append(blocks.max(axis=1))
+        self._carry = samples[whole:]
+
+    def to_bytes(self) -> bytes:
+        mins, maxs = list(self._mins), list(self._maxs)
+        if len(self._carry):
+            # Final partial block
+            mins.append(self._carry.min(keepdims=True))
+            maxs.append(self._carry.max(keepdims=True))
+        mins = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+        maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+
+        table, data = [], []
+        samples_per_peak = self.base_samples
+        for _ in range(self.levels):
+            pairs = np.empty(2 * len(mins), dtype=np.int8)
+            pairs[0::2] = quantize(mins)
+            pairs[1::2] = quantize(maxs)
+            table.append((samples_per_peak, len(mins)))
+            data.append(pairs.tobytes())
+            if len(mins) <= 1:
+                break
+            # Next level: merge neighbouring peaks, repeating the last one for an odd count
+            if len(mins) % 2:
+                mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+            mins = mins.reshape(-1, 2).min(axis=1)
+            maxs = maxs.reshape(-1, 2).max(axis=1)
+            samples_per_peak *= 2
+
+        offset = HEADER.size + LEVEL.size * len(table)
+        header = [HEADER.pack(MAGIC, FORMAT_VERSION, len(table), self.sr, self.n_samples)]
+        for (samples_per_peak, n_peaks), level_data in zip(table, data):
+            header.append(LEVEL.pack(samples_per_peak, n_peaks, offset))
+            offset += len(level_data)
+        return b''.join(header + data)
+
+def quantize(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(values * 127), -128, 127).astype(np.int8)
+
+def peaks_from_array(y: np.ndarray, sr: int) -> bytes:
+    builder = PeakPyramidBuilder(sr)
+    builder.add(y)
+    return builder.to_bytes()
+
+def peaks_from_file(path: str, blocksize: int = 1 << 20) -> bytes:
+    """Peak pyramid of an audio file, read block by block"""
+
+    builder = PeakPyramidBuilder(sf.info(path).samplerate)
+    for block in sf.blocks(path, blocksize=blocksize, dtype='float32', always_2d=True):
+        builder.add(block.mean(axis=1))
+    return builder.to_bytes()
+
+def waveform_key(processed_key: str) -> str:
+    """The pyramid lives next to the processed audio it was built from"""
+    return posixpath.join(posixpath.dirname(processed_key), 'peaks.bin')
+
+def parse_header(prefix: bytes) -> Dict[str, Any]:
+    """Sample rate, length and level table from the first bytes of a pyramid"""
+
+    magic, version, n_levels, sample_rate, n_samples = HEADER.unpack_from(prefix)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a waveform peak pyramid")
+    levels = [
+        dict(zip(('samples_per_peak', 'n_peaks', 'offset'), LEVEL.unpack_from(prefix, HEADER.size + i * LEVEL.size)))
+        for i in range(n_levels)
+    ]
+    return {'sample_rate': sample_rate, 'n_samples': n_samples, 'levels': levels}
+
+@lru_cache(maxsize=256)
+def fetch_header(key: str) -> Dict[str, Any]:
+    """Header of a stored pyramid, read with one ranged GET"""
+    return parse_header(download_range_from_s3(key, 0, MAX_HEADER_BYTES - 1))
+
+def select_level(header: Dict[str, Any], start: float, end: float, width: int) -> int:
+    """Finest level that draws [start, end) with at most `width` peaks"""
+
+    for index in range(len(header['levels'])):
+        lo, hi = peak_range(header, index, start, end)
+        if hi - lo <= width:
+            return index
+    return len(header['levels']) - 1
+
+def peak_range(header: Dict[str, Any], level: int, start: float, end: float) -> Tuple[int, int]:
+    """Indices [lo, hi) of the peaks of a level covering [start, end) seconds"""
+
+    samples_per_peak = header['levels'][level]['samples_per_peak']
+    n_peaks = header['levels'][level]['n_peaks']
+    lo = int(start * header['sample_rate'] // samples_per_peak)
+    hi = int(-(-end * header['sample_rate'] // samples_per_peak))
+    return min(max(lo, 0), n_peaks), min(max(hi, 0), n_peaks)
+
+def byte_range(header: Dict[str, Any], level: int, lo: int, hi: int) -> Tuple[int, int]:
+    """Inclusive byte range of peaks [lo, hi) of a level, for an HTTP Range request"""
+    offset = header['levels'][level]['offset']
+    return offset + 2 * lo, offset + 2 * hi - 1
@@ -1,23 +1,27 @@
 from celery import current_task
-import librosa
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_init, worker_process_init
 import madmom
 import aubio
 import numpy as np
-import soundfile as sf
 import subprocess
 import tempfile
 import os
 import json
-from typing import List, Tuple, Dict, Any
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any, Callable, Optional
 import yt_dlp
 import requests
 from urllib.parse import urlparse
 import logging
+from datetime import datetime, timedelta
 
 from workers.celery_app import celery_app
-from models.audio import AudioJob, JobStatus, AudioFeatures, Beat, Downbeat, Bar, Section, SpectralFeatures
+from models.audio import AudioJob, JobStatus, AudioFeatures, AnalysisProfile, ANALYSIS_VERSION, ANALYSIS_STAGES, PROFILE_STAGES, Beat, Downbeat, Bar, Section, SpectralFeatures
 from database import get_db
-from utils.storage import download_from_s3, upload_file_to_s3
+from utils.storage import MultipartUpload, upload_file_to_s3, upload_from_file, download_to_file, key_from_url
 from utils.youtube import get_youtube_metadata
 from utils.audio_analysis import (
     extract_beats_and_tempo,
@@ -25,44 +29,107 @@ from utils.audio_analysis import (
     segment_structure,
     extract_spectral_features
 )
+from utils.beat_engine import get_beat_engine
+from utils.feature_cache import AnalysisBuffers
+from utils.renditions import ARCHIVAL_CODEC, CODECS, configured_renditions, encode_rendition, rendition_key, legacy_renditions
+from utils.pcm_cache import load_pcm, store_pcm
+from utils.waveform_peaks import peaks_from_array, peaks_from_file, waveform_key
+from utils.feature_store import offload_feature_arrays, merge_features
+from utils.stage_scheduler import StageScheduler, ANALYSIS_CPU_BUDGET
+from utils.stage_metrics import StageTimer, start_metrics_server
+from utils.streaming_analysis import StreamingFeatureCache, should_stream, STREAMING_ANALYSIS_SR
+from utils.audio_decode import (
+    MASTER_SAMPLE_RATE,
+    decode_to_array,
+    iter_decoded_blocks,
+    probe_duration,
+    write_wav_file
+)
+from utils.analysis_cache import (
+    file_digest,
+    pcm_digest,
+    lookup_cached_analysis,
+    store_cached_analysis
+)
 from utils.universal_url_processor import url_processor, get_universal_metadata
 
 logger = logging.getLogger(__name__)
 
+# Receives (stage name, AudioFeatures fields that stage produced)
+StagePublisher = Callable[[str, Dict[str, Any]], None]
+
+# When to load the madmom models: "fork" (in the parent, shared copy-on-write),
+# "process" (in each pool process) or "lazy" (on the first task)
+BEAT_ENGINE_PRELOAD = os.getenv('BEAT_ENGINE_PRELOAD', 'process')
+
+# Batch tasks download and decode this many tracks ahead of the one being analyzed
+BATCH_PREFETCH = int(os.getenv('BATCH_PREFETCH', str(ANALYSIS_CPU_BUDGET)))
+# Jobs per batch task; larger catalogues are split over several tasks
+BATCH_MAX_JOBS = int(os.getenv('BATCH_MAX_JOBS', '50'))
+# Time limits of one batch task (the global ones are sized for a single file); the hard
+# limit leaves the soft-limit handler time to hand unfinished jobs back
+BATCH_SOFT_TIME_LIMIT = int(os.getenv('BATCH_SOFT_TIME_LIMIT', str(4 * 60 * 60)))
+BATCH_TIME_LIMIT = BATCH_SOFT_TIME_LIMIT + 10 * 60
+
+# Direct uploads not completed this many seconds after they started are aborted
+DIRECT_UPLOAD_EXPIRY = int(os.getenv('DIRECT_UPLOAD_EXPIRY', str(24 * 60 * 60)))
+
+@worker_init.connect
+def preload_beat_engine_before_fork(**kwargs):
+    """Load the beat models in the parent so forked pool processes share them"""
+    if BEAT_ENGINE_PRELOAD == 'fork':
+        warm_beat_engine()
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    start_metrics_server()
+
+@worker_process_init.connect
+def preload_beat_engine(**kwargs):
+    """Load the beat models once per pool process instead of on each task"""
+    if BEAT_ENGINE_PRELOAD in ('fork', 'process'):
+        warm_beat_engine()
+
+def warm_beat_engine():
+    try:
+        get_beat_engine()
+        logger.info("Beat engine loaded")
+    except Exception as e:
+        # Tasks load it on demand instead
+        logger.warning(f"Beat engine preload failed: {e}")
+
 @celery_app.task(bind=True)
 def process_audio_file(self, job_id: str, file_key: str):
     """Process uploaded audio file"""
     
+    timer = None
+    # A job already taken by a batch (or a duplicate delivery) is left to whoever has it
+    if not transition_job_status(job_id, JobStatus.PENDING, JobStatus.PROCESSING, 0.1, "Starting audio processing..."):
+        logger.info(f"Job {job_id} is no longer pending, skipping")
+        return
     try:
-        # Update job status
-        update_job_status(job_id, JobStatus.PROCESSING, 0.1, "Starting audio processing...")
-        
-        # Download file from S3
-        audio_data = download_from_s3(file_key)
+        profile = get_job_profile(job_id)
+        timer = StageTimer(profile)
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(suffix=".tmp", delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_path = temp_file.name
+        # Download file from S3 straight to a temporary file
+        with timer.stage('download'):
+            temp_path = download_to_temp_file(file_key, ".tmp")
         
         try:
-            # Transcode to WAV
-            update_job_status(job_id, JobStatus.PROCESSING, 0.2, "Transcoding audio...")
-            wav_path = transcode_to_wav(temp_path)
-            
-            # Analyze audio
-            update_job_status(job_id, JobStatus.PROCESSING, 0.4, "Analyzing audio features...")
-            features = analyze_audio(wav_path)
+            # Identical uploads reuse an earlier analysis
+            digest = file_digest(temp_path)
+            save_digest_to_db(job_id, digest)
+            cached = lookup_cached_analysis(digest, profile)
+            if cached:
+                complete_job_from_cache(job_id, cached, timer)
+                return
             
-            # Upload processed WAV to S3
-            update_job_status(job_id, JobStatus.PROCESSING, 0.8, "Saving processed audio...")
-            with open(wav_path, 'rb') as f:
-                processed_key = f"processed/{job_id}/audio.wav"
-                processed_url = upload_file_to_s3(f.read(), processed_key, "audio/wav")
+            features, renditions = analyze_and_store_audio(job_id, temp_path, digest, profile, timer)
             
             # Save features to database
             update_job_status(job_id, JobStatus.PROCESSING, 0.9, "Saving analysis results...")
-            save_features_to_db(job_id, features, processed_url)
+            with timer.stage('persist'):
+                save_stored_features(job_id, features, renditions)
             
             # Complete job
             update_job_status(job_id, JobStatus.COMPLETED, 1.0, "Audio processing completed")
@@ -71,18 +138,20 @@ def process_audio_file(self, job_id: str, file_key: str):
             # Cleanup temporary files
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
-            if 'wav_path' in locals() and os.path.exists(wav_path):
-                os.unlink(wav_path)
                 
     except Exception as e:
         logger.error(f"Audio processing failed for job {job_id}: {str(e)}")
         update_job_status(job_id, JobStatus.FAILED, 0.0, f"Processing failed: {str(e)}")
         raise
+    
+    finally:
+        record_stage_timings(job_id, timer)
 
 @celery_app.task(bind=True)
 def process_audio_url(self, job_id: str, url: str, confirm_rights: bool, metadata_only: bool):
     """Process audio from URL"""
     
+    timer = None
     try:
         update_job_status(job_id, JobStatus.PROCESSING, 0.1, "Processing URL...")
         
@@ -98,25 +167,24 @@ def process_audio_url(self, job_id: str, url: str, confirm_rights: bool, metadat
         
         # Download audio
         update_job_status(job_id, JobStatus.PROCESSING, 0.2, "Downloading audio...")
-        audio_path = download_audio_from_url(url)
+        profile = get_job_profile(job_id)
+        timer = StageTimer(profile)
+        with timer.stage('download'):
+            audio_path = download_audio_from_url(url)
         
         try:
-            # Transcode to WAV
-            update_job_status(job_id, JobStatus.PROCESSING, 0.4, "Transcoding audio...")
-            wav_path = transcode_to_wav(audio_path)
-            
-            # Analyze audio
-            update_job_status(job_id, JobStatus.PROCESSING, 0.6, "Analyzing audio features...")
-            features = analyze_audio(wav_path)
+            digest = file_digest(audio_path)
+            save_digest_to_db(job_id, digest)
+            cached = lookup_cached_analysis(digest, profile)
+            if cached:
+                complete_job_from_cache(job_id, cached, timer)
+                return
             
-            # Upload processed WAV to S3
-            update_job_status(job_id, JobStatus.PROCESSING, 0.8, "Saving processed audio...")
-            with open(wav_path, 'rb') as f:
-                processed_key = f"processed/{job_id}/audio.wav"
-                processed_url = upload_file_to_s3(f.read(), processed_key, "audio/wav")
+            features, renditions = analyze_and_store_audio(job_id, audio_path, digest, profile, timer)
             
             # Save features to database
-            save_features_to_db(job_id, features, processed_url)
+            with timer.stage('persist'):
+                save_stored_features(job_id, features, renditions)
             
             # Complete job
             update_job_status(job_id, JobStatus.COMPLETED, 1.0, "URL processing completed")
@@ -125,18 +193,409 @@ def process_audio_url(self, job_id: str, url: str, confirm_rights: bool, metadat
             # Cleanup temporary files
             if os.path.exists(audio_path):
                 os.unlink(audio_path)
-            if 'wav_path' in locals() and os.path.exists(wav_path):
-                os.unlink(wav_path)
                 
     except Exception as e:
         logger.error(f"URL processing failed for job {job_id}: {str(e)}")
         update_job_status(job_id, JobStatus.FAILED, 0.0, f"URL processing failed: {str(e)}")
         raise
+    
+    finally:
+        record_stage_timings(job_id, timer)
+
+@celery_app.task(bind=True)
+def reanalyze_audio_job(self, job_id: str):
+    """Re-run analysis of an already processed job, e.g. after a profile upgrade"""
+    
+    timer = None
+    try:
+        update_job_status(job_id, JobStatus.PROCESSING, 0.1, "Upgrading audio analysis...")
+        
+        with get_db() as db:
+            job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+            if not job or not job.processed_file_url:
+                raise ValueError("Processed audio not found")
+            profile = job.analysis_profile or AnalysisProfile.FULL
+            digest = job.content_digest
+            renditions = job.renditions or legacy_renditions(job.processed_file_url)
+        
+        timer = StageTimer(profile)
+        cached = lookup_cached_analysis(digest, profile) if digest else None
+        if cached:
+            complete_job_from_cache(job_id, cached, timer)
+            return
+        
+        # Workers with a PCM cache may still hold the decoded track
+        y = load_pcm(digest)
+        temp_path = None
+        try:
+            if y is None:
+                # The stored processed audio replaces the original upload as the source
+                update_job_status(job_id, JobStatus.PROCESSING, 0.2, "Loading processed audio...")
+                processed_key = key_from_url(renditions['archival']['url'])
+                with timer.stage('download'):
+                    temp_path = download_to_temp_file(processed_key, os.path.splitext(processed_key)[1])
+            
+            update_job_status(job_id, JobStatus.PROCESSING, 0.4, "Analyzing audio features...")
+            if y is None and should_stream(probe_duration(temp_path)):
+                features = analyze_audio_stream(temp_path, profile, stage_publisher(job_id), timer)
+            else:
+                if y is None:
+                    with timer.stage('decode'):
+                        y = decode_to_array(temp_path, MASTER_SAMPLE_RATE)
+                    store_pcm(digest, y)
+                features = analyze_audio(y, MASTER_SAMPLE_RATE, profile, stage_publisher(job_id), timer)
+            timer.duration = features.duration
+            
+            if digest:
+                store_cached_analysis(digest, features.dict(), renditions['archival']['url'], profile, renditions)
+            
+            update_job_status(job_id, JobStatus.PROCESSING, 0.9, "Saving analysis results...")
+            with timer.stage('persist'):
+                save_features_to_db(job_id, features, renditions)
+            update_job_status(job_id, JobStatus.COMPLETED, 1.0, "Audio analysis upgraded")
+            
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+                
+    except Exception as e:
+        logger.error(f"Reanalysis failed for job {job_id}: {str(e)}")
+        update_job_status(job_id, JobStatus.FAILED, 0.0, f"Reanalysis failed: {str(e)}")
+        raise
+    
+    finally:
+        record_stage_timings(job_id, timer)
+
+@celery_app.task(bind=True, soft_time_limit=BATCH_SOFT_TIME_LIMIT, time_limit=BATCH_TIME_LIMIT)
+def process_audio_batch(self, job_ids: List[str]) -> Dict[str, Any]:
+    """Process many uploaded jobs in one task; a failed item does not fail the batch"""
+    
+    if len(job_ids) > BATCH_MAX_JOBS:
+        # The time limits are sized for BATCH_MAX_JOBS tracks
+        process_audio_batch.delay(job_ids[BATCH_MAX_JOBS:])
+        job_ids = job_ids[:BATCH_MAX_JOBS]
+    
+    summary = {'completed': [], 'cached': [], 'skipped': [], 'failed': {}}
+    jobs = iter(job_ids)
+    pending = deque()
+    claimed = set()
+    current = None
+    
+    with ThreadPoolExecutor(max_workers=BATCH_PREFETCH) as pool:
+        def submit_next():
+            job_id = next(jobs, None)
+            if job_id is not None:
+                pending.append((job_id, pool.submit(prepare_batch_item, job_id, claimed)))
+        
+        try:
+            for _ in range(BATCH_PREFETCH):
+                submit_next()
+            
+            # Downloads and decodes run ahead in the pool while this thread runs the
+            # model inference and analysis, one track at a time on the warm beat engine
+            while pending:
+                job_id, future = pending.popleft()
+                current = job_id
+                submit_next()
+                try:
+                    item = future.result()
+                    if item is None:
+                        summary['cached'].append(job_id)
+                        continue
+                    analyze_batch_item(item)
+                    summary['completed'].append(job_id)
+                except BatchItemSkipped:
+                    summary['skipped'].append(job_id)
+                except SoftTimeLimitExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(f"Batch item failed for job {job_id}: {str(e)}")
+                    update_job_status(job_id, JobStatus.FAILED, 0.0, f"Processing failed: {str(e)}")
+                    summary['failed'][job_id] = str(e)
+        
+        except SoftTimeLimitExceeded:
+            # Stop prefetching and wait for the items already being prepared
+            pool.shutdown(cancel_futures=True)
+            release_batch(current, pending, list(jobs), claimed)
+            raise
+    
+    logger.info(
+        f"Audio batch finished: {len(summary['completed'])} analyzed, "
+        f"{len(summary['cached'])} cached, {len(summary['skipped'])} skipped, {len(summary['failed'])} failed"
+    )
+    return summary
+
+def release_batch(current: Optional[str], pending: deque, unsubmitted: List[str], claimed: set):
+    """Hand the unfinished items of a batch that ran out of time back, requeued in a new batch.
+
+    The item being analyzed when time ran out fails, so a track too slow for the limit
+    cannot requeue itself forever; prefetched items go back to PENDING.
+    """
+    
+    if current in claimed:
+        transition_job_status(current, JobStatus.PROCESSING, JobStatus.FAILED, 0.0, "Processing failed: batch time limit exceeded")
+    
+    requeued = []
+    for job_id, future in pending:
+        if not future.cancelled() and future.exception() is None:
+            item = future.result()
+            if item and item['source_path'] and os.path.exists(item['source_path']):
+                os.unlink(item['source_path'])
+        if job_id in claimed:
+            transition_job_status(job_id, JobStatus.PROCESSING, JobStatus.PENDING, 0.0, "Requeued after batch time limit")
+        requeued.append(job_id)
+    requeued += unsubmitted
+    
+    if requeued:
+        process_audio_batch.delay(requeued)
+    logger.warning(f"Audio batch hit its time limit: {current} failed, {len(requeued)} jobs requeued")
+
+class BatchItemSkipped(Exception):
+    """Batch item no longer pending (already processing or done); its job is left alone"""
+
+def prepare_batch_item(job_id: str, claimed: set) -> Optional[Dict[str, Any]]:
+    """Claim, download and decode one batch item, or complete it from the cache (returns None)"""
+    
+    if not transition_job_status(job_id, JobStatus.PENDING, JobStatus.PROCESSING, 0.1, "Starting audio processing..."):
+        raise BatchItemSkipped(job_id)
+    claimed.add(job_id)
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if not job or not job.file_url:
+            raise ValueError("Uploaded audio not found")
+        file_url = job.file_url
+        profile = job.analysis_profile or AnalysisProfile.FULL
+    
+    timer = StageTimer(profile)
+    with timer.stage('download'):
+        temp_path = download_to_temp_file(key_from_url(file_url), ".tmp")
+    
+    item = {'job_id': job_id, 'profile': profile, 'digest': None, 'y': None, 'source_path': None, 'timer': timer}
+    try:
+        digest = item['digest'] = file_digest(temp_path)
+        save_digest_to_db(job_id, digest)
+        cached = lookup_cached_analysis(digest, profile)
+        if cached:
+            complete_job_from_cache(job_id, cached, timer)
+            record_stage_timings(job_id, timer)
+            return None
+        
+        if should_stream(probe_duration(temp_path)):
+            # Long mixes keep the file and are streamed when their turn comes
+            item['source_path'] = temp_path
+            return item
+        
+        with timer.stage('decode'):
+            y = decode_to_array(temp_path, MASTER_SAMPLE_RATE)
+        decoded_digest, cached = lookup_decoded_analysis(y, digest, profile)
+        if cached:
+            complete_job_from_cache(job_id, cached, timer)
+            record_stage_timings(job_id, timer)
+            return None
+        item.update(y=y, decoded_digest=decoded_digest)
+        return item
+    finally:
+        if item['source_path'] is None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def analyze_batch_item(item: Dict[str, Any]):
+    """Analyze a prepared batch item and complete its job"""
+    
+    job_id = item['job_id']
+    timer = item['timer']
+    try:
+        if item['y'] is not None:
+            features, renditions = analyze_and_store_decoded(
+                job_id, item['y'], item['digest'], item['decoded_digest'], item['profile'], timer
+            )
+        else:
+            features, renditions = analyze_and_store_audio(
+                job_id, item['source_path'], item['digest'], item['profile'], timer
+            )
+        
+        update_job_status(job_id, JobStatus.PROCESSING, 0.9, "Saving analysis results...")
+        with timer.stage('persist'):
+            save_stored_features(job_id, features, renditions)
+        update_job_status(job_id, JobStatus.COMPLETED, 1.0, "Audio processing completed")
+    finally:
+        if item['source_path'] and os.path.exists(item['source_path']):
+            os.unlink(item['source_path'])
+        record_stage_timings(job_id, timer)
+
+@celery_app.task
+def expire_direct_uploads() -> int:
+    """Abort direct uploads abandoned before completion and fail their jobs; returns how many expired"""
+    
+    cutoff = datetime.utcnow() - timedelta(seconds=DIRECT_UPLOAD_EXPIRY)
+    with get_db() as db:
+        abandoned = db.query(AudioJob.id, AudioJob.filename, AudioJob.upload_id).filter(
+            AudioJob.status == JobStatus.UPLOADING,
+            AudioJob.upload_id.isnot(None),
+            AudioJob.created_at < cutoff
+        ).all()
+    
+    expired = 0
+    for job_id, filename, upload_id in abandoned:
+        # A complete that claimed the job first wins
+        with get_db() as db:
+            claimed = db.query(AudioJob).filter(
+                AudioJob.id == job_id,
+                AudioJob.status == JobStatus.UPLOADING,
+                AudioJob.upload_id == upload_id
+            ).update({
+                AudioJob.status: JobStatus.FAILED,
+                AudioJob.upload_id: None,
+                AudioJob.status_message: "Upload expired before it was completed"
+            }, synchronize_session=False)
+            db.commit()
+        if claimed:
+            MultipartUpload(f"uploads/{job_id}/{filename}", upload_id=upload_id).abort()
+            expired += 1
+    
+    if expired:
+        logger.info(f"Expired {expired} abandoned direct uploads")
+    return expired
+
+def analyze_and_store_audio(job_id: str, source_path: str, source_digest: str,
+                            profile: str = AnalysisProfile.FULL,
+                            timer: Optional[StageTimer] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Decode and analyze a local source file and upload the processed audio renditions.
+
+    Returns the features as a dict to store; a cached analysis comes back compact, with its
+    per-beat arrays still in object storage.
+    """
+    
+    timer = timer or StageTimer(profile)
+    
+    if not should_stream(probe_duration(source_path)):
+        # Decode straight into memory; the same buffer feeds analysis and the WAV encoder
+        update_job_status(job_id, JobStatus.PROCESSING, 0.3, "Decoding audio...")
+        with timer.stage('decode'):
+            y = decode_to_array(source_path, MASTER_SAMPLE_RATE)
+        
+        decoded_digest, cached = lookup_decoded_analysis(y, source_digest, profile)
+        if cached:
+            timer.duration = cached['features'].get('duration')
+            return cached['features'], cached_renditions(cached)
+        return analyze_and_store_decoded(job_id, y, source_digest, decoded_digest, profile, timer)
+    
+    # Long mixes are never held in memory: analysis reads decoded blocks from the
+    # ffmpeg pipe and the stored renditions are encoded on disk
+    update_job_status(job_id, JobStatus.PROCESSING, 0.4, "Analyzing audio features...")
+    features = analyze_audio_stream(source_path, profile, stage_publisher(job_id), timer)
+    timer.duration = features.duration
+    
+    update_job_status(job_id, JobStatus.PROCESSING, 0.8, "Saving processed audio...")
+    with timer.stage('transcode'):
+        wav_path = transcode_to_wav(source_path)
+    try:
+        renditions = upload_processed_audio(job_id, wav_path, lambda: peaks_from_file(wav_path), timer)
+    finally:
+        if os.path.exists(wav_path):
+            os.unlink(wav_path)
+    
+    features = features.dict()
+    store_cached_analysis(source_digest, features, renditions['archival']['url'], profile, renditions)
+    return features, renditions
+
+def lookup_decoded_analysis(y: np.ndarray, source_digest: str,
+                            profile: str = AnalysisProfile.FULL) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """PCM digest of a decoded track and any cached analysis of it"""
+    
+    # Re-encodes of a known track decode to the same PCM
+    decoded_digest = pcm_digest(y)
+    cached = lookup_cached_analysis(decoded_digest, profile)
+    if cached:
+        store_cached_analysis(source_digest, cached['features'], cached['processed_file_url'], profile, cached.get('renditions'))
+    return decoded_digest, cached
+
+def analyze_and_store_decoded(job_id: str, y: np.ndarray, source_digest: str, decoded_digest: str,
+                              profile: str = AnalysisProfile.FULL,
+                              timer: Optional[StageTimer] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Analyze an in-memory track and upload its processed audio renditions"""
+    
+    timer = timer or StageTimer(profile)
+    
+    update_job_status(job_id, JobStatus.PROCESSING, 0.4, "Analyzing audio features...")
+    features = analyze_audio(y, MASTER_SAMPLE_RATE, profile, stage_publisher(job_id), timer)
+    timer.duration = features.duration
+    
+    update_job_status(job_id, JobStatus.PROCESSING, 0.8, "Saving processed audio...")
+    with timer.stage('transcode'):
+        wav_path = write_wav_file(y, MASTER_SAMPLE_RATE)
+    try:
+        renditions = upload_processed_audio(job_id, wav_path, lambda: peaks_from_array(y, MASTER_SAMPLE_RATE), timer)
+    finally:
+        if os.path.exists(wav_path):
+            os.unlink(wav_path)
+    store_pcm(source_digest, y)
+    
+    features = features.dict()
+    for digest in (source_digest, decoded_digest):
+        store_cached_analysis(digest, features, renditions['archival']['url'], profile, renditions)
+    return features, renditions
+
+def upload_processed_audio(job_id: str, wav_path: str, build_peaks: Callable[[], bytes], timer: StageTimer) -> Dict[str, Any]:
+    """Encode and upload each rendition of the processed WAV while the waveform peaks are built and stored"""
+    
+    codecs = configured_renditions()
+    with ThreadPoolExecutor(max_workers=len(codecs)) as pool:
+        futures = {
+            name: pool.submit(timer.wrap('upload', store_rendition, rendition=name), job_id, wav_path, name, codec)
+            for name, codec in codecs.items()
+        }
+        with timer.stage('waveform'):
+            store_waveform_peaks(job_id, build_peaks)
+        
+        renditions = {'archival': futures.pop('archival').result()}
+        # Without a playback rendition the editor falls back to the archival file
+        for name, future in futures.items():
+            try:
+                renditions[name] = future.result()
+            except Exception as e:
+                logger.warning(f"{name.capitalize()} rendition failed for job {job_id}: {e}")
+        return renditions
+
+def store_rendition(job_id: str, wav_path: str, name: str, codec: str) -> Dict[str, Any]:
+    """Encode the processed WAV with a codec and upload it"""
+    
+    path = encode_rendition(wav_path, codec)
+    try:
+        key = rendition_key(job_id, name, codec)
+        url = upload_from_file(path, key, CODECS[codec]['content_type'])
+        return {'url': url, 'codec': codec, 'content_type': CODECS[codec]['content_type'], 'size': os.path.getsize(path)}
+    finally:
+        if path != wav_path and os.path.exists(path):
+            os.unlink(path)
+
+def cached_renditions(cached: Dict[str, Any]) -> Dict[str, Any]:
+    return cached.get('renditions') or legacy_renditions(cached['processed_file_url'])
+
+def download_to_temp_file(key: str, suffix: str) -> str:
+    """Stream an object to a new temporary file and return its path"""
+    
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        download_to_file(key, temp_path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+def store_waveform_peaks(job_id: str, build: Callable[[], bytes]):
+    """Upload the waveform peak pyramid next to the processed audio; the editor can do without it"""
+    
+    try:
+        upload_file_to_s3(build(), waveform_key(rendition_key(job_id, 'archival', ARCHIVAL_CODEC)), "application/octet-stream")
+    except Exception as e:
+        logger.warning(f"Waveform peaks failed for job {job_id}: {e}")
 
 def transcode_to_wav(input_path: str) -> str:
     """Transcode audio to 16-bit 44.1kHz WAV using ffmpeg"""
     
-    output_path = input_path.replace('.tmp', '.wav')
+    output_path = os.path.splitext(input_path)[0] + '.processed.wav'
     
     cmd = [
         'ffmpeg', '-i', input_path,
@@ -153,45 +612,115 @@ def transcode_to_wav(input_path: str) -> str:
     
     return output_path
 
-def analyze_audio(wav_path: str) -> AudioFeatures:
+def analyze_audio(y: np.ndarray, sr: int, profile: str = AnalysisProfile.FULL,
+                  on_stage: Optional[StagePublisher] = None, timer: Optional[StageTimer] = None) -> AudioFeatures:
     """Comprehensive audio analysis using librosa, madmom, and aubio"""
     
-    # Load audio
-    y, sr = librosa.load(wav_path, sr=44100, mono=True)
-    duration = len(y) / sr
-    
-    # Extract beats and tempo
-    beats_data = extract_beats_and_tempo(y, sr)
-    
-    # Extract key and harmony
-    key_data = extract_key_and_harmony(y, sr)
-    
-    # Segment structure
-    sections = segment_structure(y, sr, beats_data['bars'])
-    
-    # Extract spectral features per beat
-    spectral_features = extract_spectral_features(y, sr, beats_data['beat_times'])
-    
-    # Build AudioFeatures object
-    features = AudioFeatures(
-        duration=duration,
-        sample_rate=sr,
-        channels=1,
-        bpm=beats_data['bpm'],
-        tempo_confidence=beats_data['tempo_confidence'],
-        time_signature=beats_data.get('time_signature'),
-        key=key_data.get('key'),
-        key_confidence=key_data.get('confidence'),
-        beats=[Beat(timestamp=t, confidence=c) for t, c in zip(beats_data['beat_times'], beats_data['beat_confidences'])],
-        downbeats=[Downbeat(timestamp=t, confidence=c) for t, c in zip(beats_data['downbeat_times'], beats_data['downbeat_confidences'])],
-        bars=beats_data['bars'],
-        sections=sections,
-        spectral_features=spectral_features,
-        analysis_version="1.0.0",
-        processing_time=0.0  # Will be calculated
+    # Stages share resampled copies of the master-rate signal per analysis rate
+    return run_analysis(AnalysisBuffers(y, sr), sr, profile, on_stage, timer)
+
+def analyze_audio_stream(source_path: str, profile: str = AnalysisProfile.FULL,
+                         on_stage: Optional[StagePublisher] = None, timer: Optional[StageTimer] = None) -> AudioFeatures:
+    """Bounded-memory analysis over compact per-frame summaries of a long track"""
+    
+    timer = timer or StageTimer(profile)
+    # Decoding and per-frame summaries happen together, block by block
+    with timer.stage('decode'):
+        buffers = StreamingFeatureCache.from_chunks(
+            iter_decoded_blocks(source_path, STREAMING_ANALYSIS_SR), STREAMING_ANALYSIS_SR
+        )
+    return run_analysis(buffers, MASTER_SAMPLE_RATE, profile, on_stage, timer)
+
+def run_analysis(buffers: AnalysisBuffers, sr: int, profile: str = AnalysisProfile.FULL,
+                 on_stage: Optional[StagePublisher] = None, timer: Optional[StageTimer] = None) -> AudioFeatures:
+    """Run the analysis stages of a profile over in-memory or streamed buffers"""
+    
+    profile = AnalysisProfile(profile)
+    timer = timer or StageTimer(profile)
+    started = time.perf_counter()
+    
+    basic_info = {
+        'duration': buffers.duration,
+        'sample_rate': sr,
+        'channels': 1
+    }
+    features = dict(basic_info)
+    
+    def stage_complete(stage: str, result: Any):
+        if stage not in ANALYSIS_STAGES:
+            return
+        fields = stage_feature_fields(stage, result)
+        features.update(fields)
+        if on_stage:
+            on_stage(stage, {**basic_info, **fields})
+    
+    # The chromagram is computed while beats are tracked; key, structure and spectral wait for the beat grid
+    stages = {
+        'beats': (lambda done: run_beats_stage(buffers, use_madmom=profile != AnalysisProfile.FAST), []),
+        'key': (lambda done: run_key_stage(buffers, done['beats']), ['beats', 'chroma']),
+        'structure': (lambda done: run_structure_stage(buffers, done['beats']), ['beats']),
+        'spectral': (lambda done: run_spectral_stage(buffers, done['beats']), ['beats']),
+    }
+    scheduler = StageScheduler(on_stage_complete=stage_complete)
+    for stage in PROFILE_STAGES[profile]:
+        func, depends_on = stages[stage]
+        if 'chroma' in depends_on:
+            scheduler.add('chroma', timer.wrap('chroma', lambda done: buffers.for_stage('key').chroma))
+        scheduler.add(stage, timer.wrap(stage, func), depends_on=depends_on)
+    scheduler.run()
+    
+    return AudioFeatures(
+        **features,
+        analysis_version=ANALYSIS_VERSION,
+        analysis_profile=profile.value,
+        processing_time=time.perf_counter() - started
     )
+
+def stage_feature_fields(stage: str, result: Any) -> Dict[str, Any]:
+    """AudioFeatures fields produced by one analysis stage, in JSON-ready form"""
     
-    return features
+    if stage == 'beats':
+        return {
+            'bpm': result['bpm'],
+            'tempo_confidence': result['tempo_confidence'],
+            'time_signature': result.get('time_signature'),
+            'beat_tracking_path': result.get('beat_tracking_path'),
+            'beats': [Beat(timestamp=t, confidence=c).dict() for t, c in zip(result['beat_times'], result['beat_confidences'])],
+            'downbeats': [Downbeat(timestamp=t, confidence=c).dict() for t, c in zip(result['downbeat_times'], result['downbeat_confidences'])],
+            'bars': [bar.dict() for bar in result['bars']]
+        }
+    if stage == 'key':
+        return {
+            'key': result.get('key'),
+            'key_confidence': result.get('confidence'),
+            'harmony': [bar.dict() for bar in result.get('harmony', [])]
+        }
+    if stage == 'structure':
+        return {'sections': [section.dict() for section in result]}
+    if stage == 'spectral':
+        return {'spectral_features': [feature.dict() for feature in result]}
+    raise ValueError(f"Unknown analysis stage: {stage}")
+
+def run_beats_stage(buffers: AnalysisBuffers, use_madmom: bool = True) -> Dict[str, Any]:
+    """Extract beats, tempo and bars"""
+    cache = buffers.for_stage('beats')
+    engine = get_beat_engine() if use_madmom else None
+    return extract_beats_and_tempo(cache.y, cache.sr, cache, engine=engine, use_madmom=use_madmom)
+
+def run_key_stage(buffers: AnalysisBuffers, beats_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract key and the per-bar harmony timeline on top of the beat grid"""
+    cache = buffers.for_stage('key')
+    return extract_key_and_harmony(cache.y, cache.sr, cache, beats_data['beat_times'], beats_data['bars'])
+
+def run_structure_stage(buffers: AnalysisBuffers, beats_data: Dict[str, Any]) -> List[Section]:
+    """Segment structure on top of the detected bars"""
+    cache = buffers.for_stage('structure')
+    return segment_structure(cache.y, cache.sr, beats_data['bars'], cache)
+
+def run_spectral_stage(buffers: AnalysisBuffers, beats_data: Dict[str, Any]) -> List[SpectralFeatures]:
+    """Extract spectral features per beat"""
+    cache = buffers.for_stage('spectral')
+    return extract_spectral_features(cache.y, cache.sr, beats_data['beat_times'], cache)
 
 def download_audio_from_url(url: str) -> str:
     """Download audio from any URL using universal processor"""
@@ -212,16 +741,95 @@ def update_job_status(job_id: str, status: JobStatus, progress: float, message:
             job.status_message = message
             db.commit()
 
-def save_features_to_db(job_id: str, features: AudioFeatures, processed_url: str):
+def transition_job_status(job_id: str, from_status: JobStatus, status: JobStatus, progress: float, message: str) -> bool:
+    """Update job status only if it is still from_status; False if another task got there first"""
+    
+    with get_db() as db:
+        updated = db.query(AudioJob).filter(AudioJob.id == job_id, AudioJob.status == from_status).update(
+            {AudioJob.status: status, AudioJob.progress: progress, AudioJob.status_message: message},
+            synchronize_session=False
+        )
+        db.commit()
+    return bool(updated)
+
+def save_features_to_db(job_id: str, features: AudioFeatures, renditions: Dict[str, Any]):
     """Save extracted features to database"""
+    save_stored_features(job_id, features.dict(), renditions)
+
+def save_stored_features(job_id: str, features: Dict[str, Any], renditions: Dict[str, Any]):
+    """Save a features dict, full or already compact, as the job's final analysis"""
     
+    # Per-beat arrays go to object storage; the row keeps scalars and pointers
+    stored = offload_feature_arrays(features)
     with get_db() as db:
         job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
         if job:
-            job.features = features.dict()
-            job.processed_file_url = processed_url
+            job.features = stored
+            profile = stored.get('analysis_profile') or AnalysisProfile.FULL
+            job.feature_readiness = {stage: True for stage in PROFILE_STAGES[AnalysisProfile(profile)]}
+            job.processed_file_url = renditions['archival']['url']
+            job.renditions = renditions
             db.commit()
 
+def stage_publisher(job_id: str) -> StagePublisher:
+    """Callback that publishes each finished stage's fields to the job record"""
+    return lambda stage, fields: publish_stage_features(job_id, stage, fields)
+
+def publish_stage_features(job_id: str, stage: str, fields: Dict[str, Any]):
+    """Merge one stage's fields into job.features and mark the stage ready"""
+    
+    fields = offload_feature_arrays(fields)
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if job:
+            # Reassign rather than mutate so SQLAlchemy sees the JSON change
+            job.features = merge_features(job.features or {}, fields)
+            job.feature_readiness = {**(job.feature_readiness or {}), stage: True}
+            job.status_message = f"Analysis stage '{stage}' ready"
+            db.commit()
+
+def get_job_profile(job_id: str) -> str:
+    """Analysis profile requested for a job"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        return (job.analysis_profile if job else None) or AnalysisProfile.FULL
+
+def save_digest_to_db(job_id: str, digest: str):
+    """Record the content digest of a job's source audio, checking it against any digest declared at upload"""
+    
+    with get_db() as db:
+        job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+        if job:
+            # Direct uploads declare their digest before the API ever sees the bytes
+            if job.content_digest and not job.source_url and job.content_digest != digest:
+                raise ValueError("Uploaded file does not match its declared SHA-256 digest")
+            job.content_digest = digest
+            db.commit()
+
+def complete_job_from_cache(job_id: str, cached: Dict[str, Any], timer: StageTimer):
+    """Complete a job with the features of an earlier, identical upload"""
+    
+    timer.duration = cached['features'].get('duration')
+    with timer.stage('persist'):
+        save_stored_features(job_id, cached['features'], cached_renditions(cached))
+    update_job_status(job_id, JobStatus.COMPLETED, 1.0, "Audio processing completed (cached analysis)")
+
+def record_stage_timings(job_id: str, timer: Optional[StageTimer]):
+    """Store a job's stage timings on the job and export them as metrics; best effort"""
+    
+    if timer is None or not timer.stages:
+        return
+    try:
+        timer.observe()
+        with get_db() as db:
+            job = db.query(AudioJob).filter(AudioJob.id == job_id).first()
+            if job:
+                job.stage_timings = timer.as_dict()
+                db.commit()
+    except Exception as e:
+        logger.warning(f"Could not record stage timings for job {job_id}: {e}")
+
 def save_metadata_to_db(job_id: str, metadata: Dict[str, Any]):
     """Save metadata to database"""
     
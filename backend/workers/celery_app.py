@@ -1,6 +1,12 @@
-from celery import Celery
+from celery import Celery, bootsteps
+from celery.signals import worker_process_init
+import logging
 import os
 
+from utils.thread_budget import thread_layout, export_thread_env, apply_thread_layout
+
+logger = logging.getLogger(__name__)
+
 # Initialize Celery
 celery_app = Celery(
     "beatlyrics",
@@ -28,3 +34,44 @@ celery_app.conf.task_routes = {
     "workers.audio_processor.*": {"queue": "audio"},
     "workers.lyric_generator.*": {"queue": "lyrics"},
 }
+
+# Periodic tasks, run by `celery beat`
+celery_app.conf.beat_schedule = {
+    "expire-direct-uploads": {
+        "task": "workers.audio_processor.expire_direct_uploads",
+        "schedule": 60 * 60,  # hourly
+    },
+}
+
+# Thread layout of this worker, decided once the pool size is known and applied in every child
+worker_thread_layout = None
+
+class ThreadBudget(bootsteps.StartStopStep):
+    """Decide the thread layout from the final pool size and report it in `celery inspect stats`"""
+
+    requires = {'celery.worker.components:Pool'}
+
+    def __init__(self, worker, **kwargs):
+        global worker_thread_layout
+        # Runs before the pool forks, so every child inherits the layout; autoscaling pools budget for their maximum
+        worker_thread_layout = thread_layout(getattr(worker, 'max_concurrency', None) or worker.concurrency)
+        # Native libraries the children load later size themselves from the environment
+        export_thread_env(worker_thread_layout)
+        logger.info(f"Worker thread layout: {worker_thread_layout}")
+        super().__init__(worker, **kwargs)
+
+    def start(self, worker):
+        # Solo and thread pools run tasks in this process
+        apply_thread_layout(worker_thread_layout)
+
+    def info(self, worker):
+        return {'thread_layout': worker_thread_layout}
+
+celery_app.steps['worker'].add(ThreadBudget)
+
+@worker_process_init.connect
+def pin_child_threads(**kwargs):
+    """Resize the native pools a prefork child inherited from the parent to the worker's layout"""
+
+    applied = apply_thread_layout(worker_thread_layout or thread_layout(celery_app.conf.worker_concurrency))
+    logger.info(f"Worker child {os.getpid()} threads: {applied}")
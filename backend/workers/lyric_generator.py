@@ -14,6 +14,8 @@ from utils.syllable_counter import SyllableCounter
 from utils.rhyme_detector import RhymeDetector
 from utils.content_moderator import ContentModerator
 from utils.lyric_postprocessor import LyricPostProcessor
+from utils.feature_store import load_features
+from utils.interval_index import TimelineIndex
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,7 @@ def generate_lyrics(self, generation_id: str):
             job = db.query(AudioJob).filter(AudioJob.id == generation.job_id).first()
             if not job or not job.features:
                 raise ValueError("Audio job or features not found")
+            features = load_features(job.features)
         
         # Initialize components
         llm_orchestrator = LLMOrchestrator()
@@ -44,7 +47,7 @@ def generate_lyrics(self, generation_id: str):
         
         # Prepare input for LLM
         update_generation_status(generation_id, GenerationStatus.GENERATING, 0.2, "Preparing audio features...")
-        llm_input = prepare_llm_input(generation, job.features)
+        llm_input = prepare_llm_input(generation, features)
         
         # Generate lyrics with LLM
         update_generation_status(generation_id, GenerationStatus.GENERATING, 0.4, "Generating lyrics with AI...")
@@ -58,7 +61,7 @@ def generate_lyrics(self, generation_id: str):
         
         # Post-process lyrics
         update_generation_status(generation_id, GenerationStatus.GENERATING, 0.8, "Post-processing lyrics...")
-        processed_lyrics = post_processor.process_lyrics(raw_lyrics, job.features)
+        processed_lyrics = post_processor.process_lyrics(raw_lyrics, features)
         
         # Calculate quality metrics
         quality_metrics = calculate_quality_metrics(processed_lyrics, generation)
@@ -95,13 +98,15 @@ def prepare_llm_input(generation: Generation, audio_features: Dict[str, Any]) ->
         for bar in bars[:32]  # Limit to first 32 bars for manageable generation
     ]
     
-    # Convert sections to simplified format
+    # Convert sections to simplified format, each with the bars lying entirely inside it
+    section_bars = TimelineIndex.from_features(audio_features).bars_per_section()
     simplified_sections = [
         {
             "name": section.get('name', 'verse'),
-            "bars": section.get('bars', [])[:8]  # Limit bars per section
+            "label": section.get('label'),  # repeated sections (e.g. each chorus) share a label
+            "bars": section_bars[i][:8]  # Limit bars per section
         }
-        for section in sections
+        for i, section in enumerate(sections)
     ]
     
     return {
@@ -6,20 +6,19 @@ set -e
 
 echo "🧪 Running BeatLyrics test suite..."
 
-# Frontend tests
-echo "🎨 Running frontend tests..."
-npm test
+# Frontend checks (there is no frontend test script)
+echo "🎨 Linting frontend..."
+npm run lint
 
-# Backend tests
-echo "🔧 Running backend tests..."
-docker-compose exec backend pytest tests/ -v
+# Backend checks
+echo "🔧 Compiling backend..."
+docker-compose exec backend python -m compileall -q .
 
-# Integration tests
-echo "🔗 Running integration tests..."
-docker-compose exec backend pytest tests/integration/ -v
+echo "🐍 Running backend tests..."
+docker-compose exec backend python -m pytest -q tests
 
-# Audio processing tests
-echo "🎵 Running audio processing tests..."
-docker-compose exec backend pytest tests/audio/ -v
+# Audio analysis benchmark (synthetic ground truth, offline)
+echo "🎵 Running audio analysis benchmark..."
+docker-compose exec backend python -m benchmarks.audio_analysis --corpus quick --output /tmp/audio_benchmark.json
 
 echo "✅ All tests completed!"